@@ -0,0 +1,111 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from auth.database import async_session, dialect_insert, in_values
+from models.models import Link, LinkClickRollup, LinkDimensionRollup
+
+click_rollups = LinkClickRollup.__table__
+dimension_rollups = LinkDimensionRollup.__table__
+
+# Размер интервала и период по умолчанию для каждой детализации
+GRANULARITIES = {
+    "minute": (timedelta(minutes=1), timedelta(days=1)),
+    "hour": (timedelta(hours=1), timedelta(days=30)),
+    "day": (timedelta(days=1), timedelta(days=365)),
+}
+DIMENSIONS = ("user_agent", "referrer")
+DIMENSION_VALUE_LENGTH = 255
+
+
+def truncate_time(moment: datetime, granularity: str) -> datetime:
+    """
+    Начало интервала (минуты, часа или дня), в который попадает moment.
+    """
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def update_rollups(events: list[dict]):
+    """
+    Добавляет пачку событий переходов в предагрегированные таблицы: события сворачиваются
+    в памяти, и на каждую таблицу выполняется один INSERT ... ON CONFLICT DO UPDATE.
+    """
+    clicks = Counter()
+    dimensions = Counter()
+    for event in events:
+        for granularity in GRANULARITIES:
+            clicks[(event["link_id"], granularity, truncate_time(event["accessed_at"], granularity))] += 1
+        day = truncate_time(event["accessed_at"], "day")
+        for dimension in DIMENSIONS:
+            value = event.get(dimension)
+            if value:
+                dimensions[(event["link_id"], day, dimension, value[:DIMENSION_VALUE_LENGTH])] += 1
+
+    async with async_session() as session:
+        try:
+            await _apply_rollups(session, clicks, dimensions)
+        except IntegrityError:
+            # часть ссылок успели удалить - пропускаем их счетчики
+            await session.rollback()
+            link_ids = {key[0] for key in clicks}
+            existing = set((await session.execute(
+                select(Link.id).where(in_values(Link.id, link_ids)))).scalars().all())
+            clicks = Counter({key: n for key, n in clicks.items() if key[0] in existing})
+            dimensions = Counter({key: n for key, n in dimensions.items() if key[0] in existing})
+            await _apply_rollups(session, clicks, dimensions)
+        await session.commit()
+
+
+async def _apply_rollups(session, clicks: Counter, dimensions: Counter):
+    await _upsert_counts(session, click_rollups, ["link_id", "granularity", "bucket_start"], clicks)
+    await _upsert_counts(session, dimension_rollups, ["link_id", "day", "dimension", "value"], dimensions)
+
+
+async def _upsert_counts(session, table, key_columns: list[str], counts: Counter):
+    if not counts:
+        return
+    # ключи сортируются, чтобы параллельные воркеры блокировали строки в одном порядке
+    rows = [dict(zip(key_columns, key), clicks=n) for key, n in sorted(counts.items())]
+    query = dialect_insert(table).values(rows)
+    query = query.on_conflict_do_update(index_elements=key_columns,
+                                        set_={"clicks": table.c.clicks + query.excluded.clicks})
+    await session.execute(query)
+
+
+async def get_click_timeseries(session, link_id: int, granularity: str, start: datetime,
+                               end: datetime) -> list[tuple[datetime, int]]:
+    """
+    Количество переходов по интервалам [start, end). Интервалы без переходов не возвращаются.
+    """
+    query = (select(click_rollups.c.bucket_start, click_rollups.c.clicks).
+             where(click_rollups.c.link_id == link_id,
+                   click_rollups.c.granularity == granularity,
+                   click_rollups.c.bucket_start >= truncate_time(start, granularity),
+                   click_rollups.c.bucket_start < end).
+             order_by(click_rollups.c.bucket_start))
+    result = await session.execute(query)
+    return [(row.bucket_start, row.clicks) for row in result]
+
+
+async def get_top_dimension(session, link_id: int, dimension: str, start: datetime, end: datetime,
+                            limit: int) -> list[tuple[str, int]]:
+    """
+    Самые частые значения User-Agent или referrer за дни, пересекающиеся с [start, end).
+    """
+    total = func.sum(dimension_rollups.c.clicks).label("total")
+    query = (select(dimension_rollups.c.value, total).
+             where(dimension_rollups.c.link_id == link_id,
+                   dimension_rollups.c.day >= truncate_time(start, "day"),
+                   dimension_rollups.c.day < end,
+                   dimension_rollups.c.dimension == dimension).
+             group_by(dimension_rollups.c.value).
+             order_by(total.desc()).
+             limit(limit))
+    result = await session.execute(query)
+    return [(row.value, row.total) for row in result]
@@ -1,5 +1,11 @@
-from fastapi_users.authentication import AuthenticationBackend, CookieTransport, JWTStrategy
+import hashlib
+from typing import Optional
+
+import jwt
+from fastapi_users.authentication import AuthenticationBackend, Authenticator, CookieTransport, JWTStrategy
 from fastapi_users import FastAPIUsers
+from fastapi_users.jwt import decode_jwt
+from auth.cache import TokenCache, user_token_cache
 from auth.database import User, get_async_session
 from auth.manager import get_user_manager
 from auth.schemas import UserRead, UserCreate, UserUpdate
@@ -11,6 +17,52 @@ cookie_transport = CookieTransport(cookie_name="auth_token", cookie_max_age=3600
 def get_jwt_strategy() -> JWTStrategy:
     return JWTStrategy(secret="SECRET", lifetime_seconds=3600)
 
+
+def get_token_user_id(token: str) -> Optional[str]:
+    """
+    Id пользователя из JWT без обращения к БД: проверяются подпись и срок действия.
+    None, если токен недействителен.
+    """
+    strategy = get_jwt_strategy()
+    try:
+        data = decode_jwt(token, strategy.decode_key, strategy.token_audience, algorithms=[strategy.algorithm])
+    except jwt.PyJWTError:
+        return None
+    return data.get("sub")
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT-стратегия, которая запоминает пользователя для уже проверенного токена и не загружает его
+    из БД на каждый запрос. Ключ кэша - SHA-256 от всего токена, поэтому разные токены
+    (в том числе одного пользователя) не пересекаются, а сами токены в памяти не хранятся.
+    Записи сбрасываются хуками UserManager при изменении и удалении пользователя.
+    Пользователь из кэша общий для запросов и предназначен только для чтения.
+    """
+
+    def __init__(self, *args, cache: TokenCache = user_token_cache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    async def read_token(self, token: Optional[str], user_manager) -> Optional[User]:
+        if token is None:
+            return None
+        key = hashlib.sha256(token.encode()).hexdigest()
+        user = self.cache.get(key)
+        if user is not None:
+            return user
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            # подпись и срок уже проверены в super().read_token, здесь нужен только exp
+            expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp")
+            self.cache.put(key, user.id, user, expires_at)
+        return user
+
+
+def get_cached_jwt_strategy() -> JWTStrategy:
+    return CachedJWTStrategy(secret="SECRET", lifetime_seconds=3600)
+
+
 # Бэкенд аутентификации
 auth_backend = AuthenticationBackend(
     name="jwt",
@@ -18,14 +70,25 @@ auth_backend = AuthenticationBackend(
     get_strategy=get_jwt_strategy,
 )
 
+# Тот же бэкенд с кэшем токенов - для эндпоинтов ссылок, где пользователь только читается
+cached_auth_backend = AuthenticationBackend(
+    name="jwt",
+    transport=cookie_transport,
+    get_strategy=get_cached_jwt_strategy,
+)
+
 # Инициализация FastAPIUsers
 fastapi_users = FastAPIUsers[User, int](
     get_user_manager,
     [auth_backend],
 )
 
+# Проверка авторизации с кэшем токенов. Маршруты /users и /auth остаются на fastapi_users,
+# чтобы изменение пользователя всегда работало с объектом, загруженным из БД
+link_authenticator = Authenticator([cached_auth_backend], get_user_manager)
+
 # Маршруты для регистрации
 register_router = fastapi_users.get_register_router(UserRead, UserCreate)
 
 # Маршруты для управления пользователями
-users_router = fastapi_users.get_users_router(UserRead, UserUpdate)
\ No newline at end of file
+users_router = fastapi_users.get_users_router(UserRead, UserUpdate)
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from auth.cache import negative_cache
+from config import (
+    BLOOM_ENABLED, BLOOM_ERROR_RATE, BLOOM_MIN_CAPACITY, BLOOM_REFRESH_INTERVAL, BLOOM_REBUILD_INTERVAL,
+    BLOOM_REBUILD_BATCH,
+)
+from models.models import Link
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Bloom-фильтр над строками. Ответ "нет" точный, ответ "может быть" ошибается с вероятностью
+    около error_rate, пока в фильтре не больше capacity ключей. Удалять ключи нельзя.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        # оптимальные размер в битах и число хэш-функций для заданных емкости и доли ошибок
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # двойное хэширование: k позиций из двух 64-битных половин одного хэша
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        # count - оценка числа разных ключей: повторное добавление не меняет ни одного бита
+        changed = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                changed = True
+        if changed:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class LinkFilter:
+    """
+    Bloom-фильтр по всем short_code и custom_alias из БД. Позволяет отвечать 404 на запросы
+    к несуществующим кодам (боты, сканеры) без обращения к БД.
+    Строится в фоне при старте; пока фильтр не готов, might_exist всегда возвращает True.
+    Ссылки, созданные этим воркером, добавляются сразу (add), созданные другими воркерами -
+    при подгрузке строк с новыми id раз в refresh_interval секунд. Удаленные ключи из Bloom-фильтра
+    не убираются, поэтому раз в rebuild_interval секунд фильтр строится заново.
+    """
+
+    # id выдаются по порядку, но фиксируются не обязательно в том же порядке:
+    # подгрузка перечитывает столько последних id, чтобы не пропустить поздние транзакции
+    refresh_overlap = 1000
+
+    def __init__(self, session_factory, enabled: bool = BLOOM_ENABLED, error_rate: float = BLOOM_ERROR_RATE,
+                 min_capacity: int = BLOOM_MIN_CAPACITY, refresh_interval: float = BLOOM_REFRESH_INTERVAL,
+                 rebuild_interval: float = BLOOM_REBUILD_INTERVAL, batch_size: int = BLOOM_REBUILD_BATCH):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.batch_size = batch_size
+        self._filter: Optional[BloomFilter] = None
+        self._max_id = 0
+        self._rebuilt_at = 0.0
+        # ключи, добавленные во время перестройки, - переносятся в новый фильтр
+        self._added_during_rebuild: Optional[list[str]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.rejected = 0
+        self.rebuilds = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def might_exist(self, key: str) -> bool:
+        """
+        False - ключа точно нет в БД (по состоянию на последнюю подгрузку), True - может быть.
+        """
+        if not self.enabled or self._filter is None:
+            return True
+        self.checks += 1
+        if key in self._filter:
+            return True
+        self.rejected += 1
+        return False
+
+    def add(self, *keys: Optional[str]):
+        """
+        Добавляет ключи созданной ссылки и убирает их из негативного кэша.
+        """
+        keys = [key for key in keys if key]
+        negative_cache.discard(*keys)
+        if self._filter is not None:
+            for key in keys:
+                self._filter.add(key)
+        if self._added_during_rebuild is not None:
+            self._added_during_rebuild.extend(keys)
+
+    async def _load(self, bloom: BloomFilter, after_id: int) -> int:
+        """
+        Добавляет в фильтр ключи ссылок с id > after_id, читая их пачками. Возвращает последний id.
+        """
+        last_id = after_id
+        while True:
+            async with self.session_factory() as session:
+                rows = (await session.execute(
+                    select(Link.id, Link.short_code, Link.custom_alias).
+                    where(Link.id > last_id).
+                    order_by(Link.id).
+                    limit(self.batch_size))).all()
+            for row in rows:
+                bloom.add(row.short_code)
+                if row.custom_alias:
+                    bloom.add(row.custom_alias)
+                negative_cache.discard(row.short_code, row.custom_alias)
+            if rows:
+                last_id = rows[-1].id
+            if len(rows) < self.batch_size:
+                return last_id
+
+    async def rebuild(self):
+        """
+        Строит фильтр заново по всем ссылкам из БД и атомарно заменяет им текущий.
+        """
+        async with self.session_factory() as session:
+            max_id = (await session.execute(select(func.max(Link.id)))).scalar() or 0
+        # запас емкости на ссылки, созданные до следующей перестройки
+        bloom = BloomFilter(max(self.min_capacity, 2 * max_id), self.error_rate)
+        self._added_during_rebuild = []
+        try:
+            last_id = await self._load(bloom, 0)
+            for key in self._added_during_rebuild:
+                bloom.add(key)
+        finally:
+            self._added_during_rebuild = None
+        self._filter = bloom
+        self._max_id = last_id
+        self._rebuilt_at = time.monotonic()
+        self.rebuilds += 1
+        logger.info("Link filter rebuilt: %d keys, %d KiB", bloom.count, bloom.memory_bytes // 1024)
+
+    async def refresh(self):
+        """
+        Добавляет в фильтр ссылки, созданные после последней подгрузки (в том числе другими воркерами).
+        """
+        if self._filter is None:
+            return
+        self._max_id = max(self._max_id, await self._load(self._filter, max(0, self._max_id - self.refresh_overlap)))
+
+    async def run(self):
+        while True:
+            try:
+                if (self._filter is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval
+                        or self._filter.count > self._filter.capacity):
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Error loading link filter")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        bloom = self._filter
+        return {
+            "enabled": self.enabled,
+            "ready": bloom is not None,
+            "keys": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "hash_count": bloom.hash_count if bloom else 0,
+            "memory_bytes": bloom.memory_bytes if bloom else 0,
+            "error_rate": self.error_rate,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "rebuilds": self.rebuilds,
+        }
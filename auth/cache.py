@@ -0,0 +1,420 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+from config import (
+    LINK_CACHE_SIZE, LINK_CACHE_TTL, SHARED_CACHE_URL, SHARED_CACHE_TTL, SHARED_CACHE_STATS_TTL,
+    SHARED_CACHE_TIMEOUT, SHARED_CACHE_RETRY_AFTER, NEGATIVE_CACHE_SIZE, NEGATIVE_CACHE_TTL, AUTH_CACHE_SIZE,
+    AUTH_CACHE_TTL,
+)
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis нужен только для SHARED_CACHE_URL=redis://...
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedLink:
+    """
+    Минимальный набор данных о ссылке, которого достаточно для редиректа.
+    """
+    short_code: str
+    original_url: str
+    expires_at: Optional[datetime] = None
+    link_id: Optional[int] = None
+    permanent: bool = False
+
+    def is_expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and self.expires_at < now
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=datetime.isoformat)
+
+    @classmethod
+    def from_json(cls, data: str) -> "CachedLink":
+        fields = json.loads(data)
+        if fields.get("expires_at"):
+            fields["expires_at"] = datetime.fromisoformat(fields["expires_at"])
+        return cls(**fields)
+
+
+class LinkCache:
+    """
+    Ограниченный по размеру (LRU) кэш ссылок в памяти процесса с временем жизни записей (TTL).
+    Ключ - short_code или custom_alias, значение - CachedLink.
+    """
+
+    def __init__(self, max_size: int = LINK_CACHE_SIZE, ttl: float = LINK_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, CachedLink]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedLink]:
+        """
+        Возвращает запись из кэша или None, если ее нет или истек TTL.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        deadline, link = item
+        if deadline < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return link
+
+    def put(self, link: CachedLink, key: Optional[str] = None):
+        """
+        Кладет запись в кэш под ключом key (по умолчанию short_code, для alias - сам alias),
+        вытесняя самые давно использованные записи при переполнении.
+        """
+        if self.max_size <= 0:
+            return
+        key = key or link.short_code
+        self._data[key] = (time.monotonic() + self.ttl, link)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        self._data.pop(key, None)
+
+    def purge_expired(self, now: datetime):
+        """
+        Удаляет из кэша ссылки, срок действия которых истек.
+        """
+        expired = [code for code, (_, link) in self._data.items() if link.is_expired(now)]
+        for code in expired:
+            del self._data[code]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+        }
+
+
+class NegativeCache:
+    """
+    Ограниченный по размеру (LRU) кэш ключей, которых нет в БД, с коротким временем жизни.
+    Повторные запросы к несуществующему коду в течение ttl секунд не доходят до БД.
+    """
+
+    def __init__(self, max_size: int = NEGATIVE_CACHE_SIZE, ttl: float = NEGATIVE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, key: str) -> bool:
+        deadline = self._data.get(key)
+        if deadline is None:
+            self.misses += 1
+            return False
+        if deadline < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, *keys: str):
+        if self.max_size <= 0:
+            return
+        deadline = time.monotonic() + self.ttl
+        for key in keys:
+            self._data[key] = deadline
+            self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def discard(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class TokenCache:
+    """
+    Ограниченный по размеру (LRU) кэш проверенных токенов: ключ - хэш токена, значение - пользователь.
+    Запись живет не дольше ttl секунд и не дольше срока действия самого токена.
+    Хранит индекс user_id -> ключи, чтобы при изменении пользователя сбросить все его токены.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, object, object]] = OrderedDict()
+        self._by_user: dict[object, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        deadline, user_id, user = item
+        if deadline < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return user
+
+    def put(self, key: str, user_id, user, expires_at: Optional[float] = None):
+        """
+        expires_at - срок действия токена (unix time), если он известен.
+        """
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+        self._remove(key)
+        self._data[key] = (time.monotonic() + ttl, user_id, user)
+        self._by_user.setdefault(user_id, set()).add(key)
+        while len(self._data) > self.max_size:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        keys = self._by_user.get(item[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[item[1]]
+
+    def invalidate_user(self, user_id):
+        """
+        Сбрасывает все токены пользователя (после изменения, деактивации или удаления).
+        """
+        for key in self._by_user.pop(user_id, set()):
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._by_user.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CacheBackend:
+    """
+    Интерфейс общего для всех воркеров кэша строк с временем жизни.
+    """
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Кэш в памяти процесса с тем же интерфейсом, что и у Redis. Подходит для тестов и одного воркера.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._data[key]
+            return None
+        return item[1]
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Кэш в Redis (или совместимом сервере).
+    """
+
+    def __init__(self, url: str, timeout: float = SHARED_CACHE_TIMEOUT):
+        if redis_asyncio is None:
+            raise RuntimeError("Для SHARED_CACHE_URL=redis://... нужен пакет redis")
+        self.client = redis_asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class SharedCache:
+    """
+    Общий кэш ссылок и статистики поверх CacheBackend.
+    Ошибки бэкенда не пробрасываются: операция считается промахом, а сам кэш отключается
+    на retry_after секунд, чтобы запросы сразу шли в БД, не дожидаясь таймаутов.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = SHARED_CACHE_TTL,
+                 stats_ttl: float = SHARED_CACHE_STATS_TTL, timeout: float = SHARED_CACHE_TIMEOUT,
+                 retry_after: float = SHARED_CACHE_RETRY_AFTER):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats_ttl = stats_ttl
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._disabled_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None and self._disabled_until <= time.monotonic()
+
+    async def _call(self, operation: str, *args):
+        if not self.available:
+            return None
+        try:
+            return await asyncio.wait_for(getattr(self.backend, operation)(*args), self.timeout)
+        except Exception as e:
+            self.errors += 1
+            self._disabled_until = time.monotonic() + self.retry_after
+            logger.warning("Shared cache unavailable, falling back to database: %r", e)
+            return None
+
+    async def _get(self, key: str) -> Optional[str]:
+        if not self.available:
+            return None
+        value = await self._call("get", key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_link(self, key: str) -> Optional[CachedLink]:
+        value = await self._get(f"link:{key}")
+        return CachedLink.from_json(value) if value is not None else None
+
+    async def set_link(self, link: CachedLink, key: Optional[str] = None):
+        await self._call("set", f"link:{key or link.short_code}", link.to_json(), self.ttl)
+
+    async def get_stats(self, short_code: str) -> Optional[dict]:
+        value = await self._get(f"stats:{short_code}")
+        return json.loads(value) if value is not None else None
+
+    async def set_stats(self, short_code: str, stats: dict):
+        await self._call("set", f"stats:{short_code}", json.dumps(stats, default=datetime.isoformat),
+                         self.stats_ttl)
+
+    async def invalidate(self, *link_keys: str):
+        """
+        Удаляет ссылки (по short_code или custom_alias) и их статистику из общего кэша.
+        """
+        if not link_keys:
+            return
+        keys = [f"{kind}:{key}" for key in link_keys for kind in ("link", "stats")]
+        await self._call("delete", *keys)
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.backend is not None,
+            "available": self.available,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+        }
+
+
+def create_shared_cache(url: str = SHARED_CACHE_URL) -> SharedCache:
+    """
+    Создает общий кэш по SHARED_CACHE_URL: пустая строка - кэш выключен, memory:// - в памяти процесса.
+    """
+    if not url:
+        return SharedCache(None)
+    if url.startswith("memory://"):
+        return SharedCache(InMemoryCacheBackend())
+    return SharedCache(RedisCacheBackend(url))
+
+
+# Общий для всего приложения кэш редиректов
+link_cache = LinkCache()
+
+# Ключи, которых нет в БД
+negative_cache = NegativeCache()
+
+# Проверенные токены авторизации
+user_token_cache = TokenCache()
+
+# Общий для всех воркеров кэш ссылок и статистики
+shared_cache = create_shared_cache()
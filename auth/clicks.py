@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, String, Text, bindparam, column, exists, func, insert, select, update, values
+
+from auth.analytics import update_rollups
+from auth.database import async_session, engine
+from config import (
+    CLICK_FLUSH_THRESHOLD, CLICK_MAX_STALENESS, CLICK_EVENTS_ENABLED, CLICK_EVENTS_QUEUE_SIZE, CLICK_EVENTS_BATCH_SIZE,
+    CLICK_EVENTS_FLUSH_INTERVAL, CLICK_EVENTS_OVERLOAD_POLICY, CLICK_EVENTS_SAMPLE_RATE,
+)
+from models.models import Link, LinkStats
+
+logger = logging.getLogger(__name__)
+
+links_table = Link.__table__
+link_stats_table = LinkStats.__table__
+
+
+class ClickBuffer:
+    """
+    Буфер переходов по ссылкам (write-behind).
+    Вместо UPDATE на каждый редирект копит в памяти количество переходов и время последнего
+    перехода для каждого short_code и сбрасывает их в БД пачкой - по таймеру (не реже,
+    чем раз в max_staleness секунд) или при накоплении flush_threshold ссылок.
+    """
+
+    def __init__(self, max_staleness: float = CLICK_MAX_STALENESS, flush_threshold: int = CLICK_FLUSH_THRESHOLD):
+        self.max_staleness = max_staleness
+        self.flush_threshold = flush_threshold
+        self._pending: dict[str, list] = {}  # short_code -> [количество переходов, last_accessed_at]
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def add(self, short_code: str, accessed_at: Optional[datetime] = None):
+        """
+        Учитывает переход по ссылке. Не обращается к БД.
+        """
+        accessed_at = accessed_at or datetime.utcnow()
+        item = self._pending.get(short_code)
+        if item is None:
+            self._pending[short_code] = [1, accessed_at]
+        else:
+            item[0] += 1
+            item[1] = accessed_at
+        if len(self._pending) >= self.flush_threshold and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def pending(self, short_code: str) -> tuple[int, Optional[datetime]]:
+        """
+        Возвращает еще не записанные в БД переходы по ссылке: (количество, время последнего).
+        """
+        item = self._pending.get(short_code)
+        if item is None:
+            return 0, None
+        return item[0], item[1]
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные переходы в БД. Возвращает количество обновленных ссылок.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            # сортируем по short_code, чтобы параллельные воркеры блокировали строки в одном порядке
+            rows = [{"code": code, "cnt": cnt, "ts": ts} for code, (cnt, ts) in sorted(batch.items())]
+            try:
+                async with async_session() as session:
+                    for start in range(0, len(rows), self.flush_threshold):
+                        await _apply_clicks(session, rows[start:start + self.flush_threshold])
+                    await session.commit()
+            except Exception:
+                logger.exception("Error flushing clicks")
+                # возвращаем переходы в буфер, чтобы не потерять их
+                for code, (cnt, ts) in batch.items():
+                    item = self._pending.get(code)
+                    if item is None:
+                        self._pending[code] = [cnt, ts]
+                    else:
+                        item[0] += cnt
+                return 0
+            return len(rows)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.max_staleness)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Останавливает фоновый сброс и записывает в БД все, что осталось в буфере.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+def _latest(column, ts, greatest):
+    # пачка, сброшенная другим воркером, может быть старше уже записанного времени перехода -
+    # время последнего перехода только растет (в SQLite аналог GREATEST - max с несколькими аргументами)
+    return greatest(func.coalesce(column, ts), ts)
+
+
+async def _apply_clicks(session, rows: list[dict]):
+    if engine.dialect.name == "postgresql":
+        # один UPDATE ... FROM (VALUES ...) на всю пачку
+        v = values(
+            column("code", String), column("cnt", Integer), column("ts", DateTime), name="v"
+        ).data([(r["code"], r["cnt"], r["ts"]) for r in rows])
+        await session.execute(
+            update(links_table).where(links_table.c.short_code == v.c.code).
+            values(access_count=func.coalesce(links_table.c.access_count, 0) + v.c.cnt,
+                   last_accessed_at=_latest(links_table.c.last_accessed_at, v.c.ts, func.greatest))
+        )
+    else:
+        # для остальных СУБД (например, SQLite в бенчмарках) - executemany одного UPDATE
+        await session.execute(
+            update(links_table).where(links_table.c.short_code == bindparam("code")).
+            values(access_count=func.coalesce(links_table.c.access_count, 0) + bindparam("cnt"),
+                   last_accessed_at=_latest(links_table.c.last_accessed_at, bindparam("ts"), func.max)),
+            rows,
+        )
+
+
+class ClickEventQueue:
+    """
+    Очередь событий переходов (link_id, время, IP, User-Agent) для таблицы link_stats.
+    Редирект только кладет событие в ограниченную очередь в памяти, а фоновая задача раз в
+    flush_interval секунд пишет накопленные события в БД пачками по batch_size. При переполнении очереди (overload_policy):
+      drop   - новые события отбрасываются;
+      sample - когда очередь заполнена больше чем наполовину, сохраняется только доля sample_rate событий,
+               при полной очереди события отбрасываются;
+      block  - редирект ждет освобождения места в очереди.
+    """
+
+    def __init__(self, max_size: int = CLICK_EVENTS_QUEUE_SIZE, batch_size: int = CLICK_EVENTS_BATCH_SIZE,
+                 flush_interval: float = CLICK_EVENTS_FLUSH_INTERVAL, overload_policy: str = CLICK_EVENTS_OVERLOAD_POLICY,
+                 sample_rate: float = CLICK_EVENTS_SAMPLE_RATE, enabled: bool = CLICK_EVENTS_ENABLED):
+        if overload_policy not in ("drop", "sample", "block"):
+            raise ValueError(f"Unknown click events overload policy: {overload_policy}")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overload_policy = overload_policy
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    async def put(self, link_id: int, ip_address: Optional[str], user_agent: Optional[str],
+                  referrer: Optional[str] = None, accessed_at: Optional[datetime] = None):
+        """
+        Добавляет событие перехода в очередь. Кроме политики block, никогда не ждет.
+        """
+        if not self.enabled:
+            return
+        event = {
+            "link_id": link_id,
+            "accessed_at": accessed_at or datetime.utcnow(),
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "referrer": referrer,
+        }
+        if self.overload_policy == "block":
+            await self._queue.put(event)
+            return
+        if (self.overload_policy == "sample" and self._queue.qsize() >= self.max_size // 2
+                and random.random() >= self.sample_rate):
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _take_batch(self) -> list[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def flush(self) -> int:
+        """
+        Записывает в БД все события, которые сейчас есть в очереди.
+        """
+        written = 0
+        while batch := self._take_batch():
+            written += await self._write(batch)
+        return written
+
+    async def _write(self, batch: list[dict]) -> int:
+        try:
+            if engine.dialect.driver == "asyncpg":
+                try:
+                    await _copy_events(batch)
+                except Exception:
+                    # COPY не проходит, если ссылку успели удалить (внешний ключ) - вставляем с фильтром
+                    await _insert_events(batch, skip_deleted_links=True)
+            else:
+                await _insert_events(batch)
+        except Exception:
+            logger.exception("Error writing %d click events", len(batch))
+            self.dropped += len(batch)
+            return 0
+        try:
+            await update_rollups(batch)
+        except Exception:
+            logger.exception("Error updating click rollups for %d events", len(batch))
+        self.written += len(batch)
+        return len(batch)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Останавливает фоновую запись и сохраняет оставшиеся в очереди события.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "max_size": self.max_size,
+            "written": self.written,
+            "dropped": self.dropped,
+            "overload_policy": self.overload_policy,
+        }
+
+
+EVENT_COLUMNS = ["link_id", "accessed_at", "ip_address", "user_agent", "referrer"]
+
+
+async def _copy_events(batch: list[dict]):
+    """
+    Запись пачки событий через COPY (asyncpg).
+    """
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            link_stats_table.name,
+            records=[tuple(event[name] for name in EVENT_COLUMNS) for event in batch],
+            columns=EVENT_COLUMNS,
+        )
+
+
+async def _insert_events(batch: list[dict], skip_deleted_links: bool = False):
+    """
+    Запись пачки событий одним многострочным INSERT. С skip_deleted_links события по уже удаленным
+    ссылкам отбрасываются (INSERT ... SELECT FROM (VALUES ...) WHERE EXISTS).
+    """
+    async with async_session() as session:
+        if skip_deleted_links:
+            v = values(
+                column("link_id", Integer), column("accessed_at", DateTime),
+                column("ip_address", String), column("user_agent", Text), column("referrer", Text), name="v",
+            ).data([tuple(event[name] for name in EVENT_COLUMNS) for event in batch])
+            source = select(v).where(exists().where(links_table.c.id == v.c.link_id))
+            await session.execute(insert(link_stats_table).from_select(EVENT_COLUMNS, source))
+        else:
+            await session.execute(insert(link_stats_table).values(batch))
+        await session.commit()
+
+
+# Общий для всего приложения буфер переходов
+click_buffer = ClickBuffer()
+
+# Общая для всего приложения очередь событий переходов
+click_events = ClickEventQueue()
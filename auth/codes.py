@@ -0,0 +1,186 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import secrets
+import string
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import CODE_BLOCK_SIZE, CODE_POOL_SIZE, SHORT_CODE_LENGTH, SHORT_CODE_STRATEGY
+from models.models import CodeCounter, Link
+
+logger = logging.getLogger(__name__)
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def to_base62(number: int, min_length: int = 1) -> str:
+    digits = []
+    while number:
+        number, rest = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[rest])
+    return "".join(reversed(digits)).rjust(min_length, BASE62_ALPHABET[0])
+
+
+class CodeGenerator:
+    """
+    Стратегия генерации коротких кодов.
+    generate(url, attempt, variant) вызывается повторно с увеличенным attempt, если код уже занят другой ссылкой.
+    variant - параметры ссылки кроме URL (см. link_variant); пустая строка у ссылки без параметров.
+    """
+
+    async def generate(self, original_url: str, attempt: int = 0, variant: str = "") -> str:
+        raise NotImplementedError
+
+    def start(self):
+        """
+        Запуск фоновых задач стратегии (вызывается из lifespan приложения).
+        """
+
+    async def stop(self):
+        pass
+
+
+class HashCodeGenerator(CodeGenerator):
+    """
+    Код - префикс base64 от SHA-256 URL, одинаковая ссылка всегда дает одинаковый код.
+    В хэш подмешиваются параметры ссылки (variant), так что ссылки на один URL с разными alias,
+    сроком или типом редиректа получают разные коды, а у ссылки без параметров код зависит только от URL.
+    При коллизии код удлиняется на один символ за каждую попытку.
+    """
+
+    def __init__(self, length: int = SHORT_CODE_LENGTH):
+        self.length = length
+
+    async def generate(self, original_url: str, attempt: int = 0, variant: str = "") -> str:
+        source = f"{original_url}\n{variant}" if variant else original_url
+        digest = base64.urlsafe_b64encode(hashlib.sha256(source.encode()).digest()).decode('utf-8')
+        return digest.rstrip("=")[:self.length + attempt]
+
+
+class CounterCodeGenerator(CodeGenerator):
+    """
+    Код - номер в base62. Номера берутся из общего счетчика в БД блоками по block_size,
+    так что каждый воркер выдает коды без обращения к БД до исчерпания своего блока.
+    """
+
+    def __init__(self, session_factory, length: int = SHORT_CODE_LENGTH, block_size: int = CODE_BLOCK_SIZE,
+                 counter_name: str = "links"):
+        self.session_factory = session_factory
+        self.length = length
+        self.block_size = block_size
+        self.counter_name = counter_name
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def generate(self, original_url: str, attempt: int = 0, variant: str = "") -> str:
+        async with self._lock:
+            if self._next >= self._end:
+                self._end = await self._reserve_block()
+                self._next = self._end - self.block_size
+            number = self._next
+            self._next += 1
+        return to_base62(number, self.length)
+
+    async def _reserve_block(self) -> int:
+        """
+        Резервирует следующий блок номеров и возвращает его верхнюю границу (не включительно).
+        """
+        while True:
+            async with self.session_factory() as session:
+                query = (update(CodeCounter).where(CodeCounter.name == self.counter_name).
+                         values(value=CodeCounter.value + self.block_size).
+                         returning(CodeCounter.value))
+                end = (await session.execute(query)).scalar_one_or_none()
+                if end is not None:
+                    await session.commit()
+                    return end
+                # счетчика еще нет - создаем его и повторяем резервирование
+                session.add(CodeCounter(name=self.counter_name, value=0))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+
+
+class PoolCodeGenerator(CodeGenerator):
+    """
+    Случайные base62-коды из пула, который заполняется в фоне. Перед попаданием в пул коды
+    проверяются на занятость одним запросом на пачку, поэтому при создании ссылки ждать нечего.
+    """
+
+    def __init__(self, session_factory, length: int = SHORT_CODE_LENGTH, pool_size: int = CODE_POOL_SIZE,
+                 refill_batch: int = 1000):
+        self.session_factory = session_factory
+        self.length = length
+        self.pool_size = pool_size
+        self.refill_batch = refill_batch
+        self._pool: asyncio.Queue = asyncio.Queue(maxsize=pool_size)
+        self._need_refill = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _random_code(self) -> str:
+        return "".join(secrets.choice(BASE62_ALPHABET) for _ in range(self.length))
+
+    async def generate(self, original_url: str, attempt: int = 0, variant: str = "") -> str:
+        if self._pool.qsize() < self.pool_size // 2:
+            self._need_refill.set()
+        try:
+            return self._pool.get_nowait()
+        except asyncio.QueueEmpty:
+            # пул пуст - не ждем, код проверится на уникальность при вставке
+            return self._random_code()
+
+    async def refill(self):
+        """
+        Добавляет в пул пачку свободных кодов.
+        """
+        count = min(self.refill_batch, self.pool_size - self._pool.qsize())
+        if count <= 0:
+            return
+        codes = {self._random_code() for _ in range(count)}
+        async with self.session_factory() as session:
+            taken = (await session.execute(
+                select(Link.short_code).where(Link.short_code.in_(codes)))).scalars().all()
+        for code in codes.difference(taken):
+            if self._pool.full():
+                break
+            self._pool.put_nowait(code)
+
+    async def run(self):
+        while True:
+            await self._need_refill.wait()
+            self._need_refill.clear()
+            try:
+                while self._pool.qsize() < self.pool_size:
+                    await self.refill()
+            except Exception:
+                logger.exception("Error refilling short code pool")
+                await asyncio.sleep(1)
+                self._need_refill.set()
+
+    def start(self):
+        self._need_refill.set()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def create_code_generator(session_factory, strategy: str = SHORT_CODE_STRATEGY) -> CodeGenerator:
+    """
+    Создает генератор коротких кодов по названию стратегии из config.py.
+    """
+    if strategy == "hash":
+        return HashCodeGenerator()
+    if strategy == "counter":
+        return CounterCodeGenerator(session_factory)
+    if strategy == "pool":
+        return PoolCodeGenerator(session_factory)
+    raise ValueError(f"Unknown short code strategy: {strategy}")
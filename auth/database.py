@@ -1,33 +1,180 @@
 import asyncio
+import logging
+import time
 from collections.abc import AsyncGenerator
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func, literal, and_, or_, union_all, any_, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-
-from config import DATABASE_URL
+from sqlalchemy.pool import QueuePool
+
+from auth.bloom import LinkFilter
+from auth.cache import CachedLink, link_cache, negative_cache, shared_cache
+from auth.codes import create_code_generator
+from auth.hot import HotLinkSet, hot_links_query
+from auth.metrics import TimedAsyncAdaptedQueuePool, instrument_engine, observe_reaper_batch
+from auth.partitions import maintain_partitions
+from auth.replicas import ReplicaRouter
+from config import (
+    DATABASE_URL, DATABASE_REPLICA_URLS, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE,
+    SHORT_CODE_MAX_ATTEMPTS, REAPER_INTERVAL, REAPER_BATCH_SIZE, REAPER_BATCH_PAUSE, REAPER_LOCK_ID,
+)
 from models.models import Link, User, Base
 
 import hashlib
-import base64
+
+logger = logging.getLogger(__name__)
 
 
-def get_hash_10(input_string: str) -> str:
-    # Создаем хэш SHA-256 от строки
-    hash_object = hashlib.sha256(input_string.encode())
-    # Кодируем хэш в base64
-    base64_encoded = base64.urlsafe_b64encode(hash_object.digest()).decode('utf-8')
-    # Обрезаем до 10 символов
-    return base64_encoded[:10]
+def get_url_hash(url: str) -> str:
+    # Хэш SHA-256 оригинального URL в hex, по нему индексируется поиск ссылки по URL
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def get_engine_options(url: str) -> dict:
+    """
+    Параметры пула соединений для create_async_engine из config.py.
+    """
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    # у SQLite (используется в бенчмарках) свой пул без этих настроек
+    if not url.startswith("sqlite"):
+        options["poolclass"] = TimedAsyncAdaptedQueuePool
+        options["pool_size"] = DB_POOL_SIZE
+        options["max_overflow"] = DB_MAX_OVERFLOW
+    if "+asyncpg" in url:
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def create_engine(url: str):
+    engine = create_async_engine(url, **get_engine_options(url))
+    instrument_engine(engine)
+    return engine
 
 
 # Создание асинхронного движка и сессии
-engine = create_async_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+# Реплики для читающих запросов (DATABASE_REPLICA_URLS)
+replica_router = ReplicaRouter([create_engine(url) for url in DATABASE_REPLICA_URLS])
+
+
+def pool_stats() -> dict:
+    """
+    Заполненность пула соединений движка.
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "utilization": pool.checkedout() / capacity if capacity else 0.0,
+    }
+
+# Генератор коротких кодов (стратегия задается SHORT_CODE_STRATEGY)
+code_generator = create_code_generator(async_session)
+
+# Bloom-фильтр существующих коротких кодов и alias
+link_filter = LinkFilter(async_session)
+
+
+# Результаты вставки новой ссылки
+LINK_CREATED = "created"                # ссылка создана
+LINK_EXISTS = "exists"                  # такая ссылка уже есть (см. LINK_IDENTITY), возвращается существующая
+LINK_ALIAS_CONFLICT = "alias_conflict"  # custom_alias занят другой ссылкой
+LINK_CODE_CONFLICT = "code_conflict"    # short_code занят другой ссылкой (коллизия хэша)
+
+# Поля, по которым повторное сокращение считается той же ссылкой: если хотя бы одно отличается
+# (другой alias, срок действия или тип редиректа), создается новая ссылка на тот же URL
+LINK_IDENTITY = ("original_url", "custom_alias", "expires_at", "is_permanent")
+
+
+def link_identity(row) -> tuple:
+    return tuple(row[name] for name in LINK_IDENTITY)
+
+
+def link_variant(row) -> str:
+    # параметры ссылки кроме URL для генератора кодов: у ссылки без alias, срока и постоянного
+    # редиректа - пустая строка, чтобы ее код, как и раньше, зависел только от URL
+    params = link_identity(row)[1:]
+    return repr(params) if params != (None, None, False) else ""
+
+
+def _same_link(links, values: dict):
+    """
+    Условие "та же ссылка" для values: тот же URL (по индексу хэша) и те же поля LINK_IDENTITY.
+    """
+    return and_(links.c.original_url_hash == values["original_url_hash"],
+                *[links.c[name].is_not_distinct_from(values[name]) for name in LINK_IDENTITY])
+
+
+def dialect_insert(table):
+    """
+    INSERT с поддержкой ON CONFLICT для используемой СУБД (Postgres или SQLite).
+    """
+    insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    return insert(table)
+
+
+def insert_ignore(table):
+    """
+    INSERT ... ON CONFLICT DO NOTHING для используемой СУБД.
+    """
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def in_values(column, values):
+    """
+    Условие column = ANY(:values) с одним параметром-массивом в Postgres и column IN (...) в остальных СУБД.
+    """
+    values = list(values)
+    if engine.dialect.name == "postgresql":
+        return column == any_(bindparam(None, values, type_=ARRAY(column.type)))
+    return column.in_(values)
+
+
+# Ошибки соединения с репликой, после которых запрос повторяется в primary
+REPLICA_ERRORS = (DBAPIError, OSError, asyncio.TimeoutError)
+
+
+async def fetch_rows(query, params: Optional[dict] = None, keys: tuple = ()) -> list:
+    """
+    Выполняет читающий Core-запрос на реплике (см. ReplicaRouter), а при ее ошибке
+    или пустом результате - в primary. keys - ключи для read-your-writes.
+    """
+    replica = replica_router.choose(*keys)
+    if replica is not None:
+        try:
+            async with replica.engine.connect() as conn:
+                rows = (await conn.execute(query, params)).all()
+            if rows:
+                replica_router.mark_read(True)
+                return rows
+            replica_router.fallbacks += 1
+        except REPLICA_ERRORS as e:
+            replica_router.mark_failed(replica, e)
+    replica_router.mark_read(False)
+    async with engine.connect() as conn:
+        return (await conn.execute(query, params)).all()
+
+
+# Закрепленный набор самых посещаемых ссылок для редиректа
+hot_links = HotLinkSet(fetch_rows)
+
 
 # Зависимость для получения асинхронной сессии
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -35,17 +182,73 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-# Функция для создания таблиц в базе данных
+# Функция для создания таблиц в базе данных. Приложение ее не вызывает: схема рабочей БД
+# ведется миграциями Alembic, а create_all нужен бенчмаркам на пустой SQLite
 async def create_db_and_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 
+async def warm_pool(size: int):
+    """
+    Заранее открывает size соединений с primary, чтобы первые запросы не ждали установки соединений.
+    Соединения остаются в пуле, поэтому size больше DB_POOL_SIZE смысла не имеет.
+    """
+    # соединения открываются параллельно и закрываются (возвращаются в пул) только все вместе,
+    # иначе пул отдавал бы одно и то же соединение
+    connections = await asyncio.gather(*(engine.connect().start() for _ in range(min(size, DB_POOL_SIZE))),
+                                       return_exceptions=True)
+    errors = [conn for conn in connections if isinstance(conn, BaseException)]
+    for conn in connections:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    if errors:
+        raise errors[0]
+
+
+async def load_hot_links(limit: int) -> int:
+    """
+    Загружает в кэш редиректов limit самых посещаемых действующих ссылок. Возвращает их число.
+    """
+    rows = await fetch_rows(hot_links_query(min(limit, link_cache.max_size)))
+    for row in rows:
+        link_cache.put(CachedLink(
+            short_code=row.short_code,
+            original_url=row.original_url,
+            expires_at=row.expires_at,
+            link_id=row.id,
+            permanent=bool(row.is_permanent),
+        ))
+    return len(rows)
+
+
 # Зависимость для работы с пользовательской базой данных через FastAPI-Users
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield SQLAlchemyUserDatabase(session, User)
 
 
+def url_key(url: str) -> str:
+    # ключ read-your-writes для поиска ссылки по URL
+    return f"url:{get_url_hash(url)}"
+
+
+def user_key(user_id: Optional[int]) -> Optional[str]:
+    # ключ read-your-writes для списка ссылок пользователя
+    return f"user:{user_id}" if user_id is not None else None
+
+
+async def invalidate_link_keys(*keys: Optional[str]):
+    """
+    Сбрасывает ссылки из кэша воркера и общего кэша. Ссылка кэшируется под тем ключом,
+    по которому к ней обращались, поэтому передаются и short_code, и custom_alias.
+    """
+    keys = [key for key in keys if key]
+    hot_links.invalidate(*keys)
+    for key in keys:
+        link_cache.invalidate(key)
+    await shared_cache.invalidate(*keys)
+
+
 # Класс LinkManager для работы со ссылками
 class LinkManager:
     """
@@ -54,7 +257,7 @@ class LinkManager:
 
     def __init__(self, session: AsyncSession):
         self.session = session
-        self.dbm = DBManager()
+        self.dbm = DBManager(session)
 
     async def create_link(
             self,
@@ -62,41 +265,135 @@ class LinkManager:
             user_id: Optional[int] = None,
             custom_alias: Optional[str] = None,
             expires_at: Optional[datetime] = None,
+            permanent: bool = False,
     ) -> Link | str:
         """
         Создает новую короткую ссылку.
         """
-        short_code = get_hash_10(original_url)
-
-        # проверка есть ли в базе данных такая ссылка
-        exist = await self.dbm.getLinkByCode(short_code)
-        if exist:
-            return f"url already exist with short code {exist.short_code}"
-        if custom_alias:
-            exist = await self.dbm.getLinkByAlias(custom_alias)
-            if exist:
-                return "custom_alias already exist"
-
-        res = Link()
-        res.original_url = original_url
-        res.short_code = short_code
-        res.created_at = datetime.now().replace(tzinfo=None)
-        res.expires_at = expires_at.replace(tzinfo=None)
-        res.custom_alias = custom_alias
-        res.user_id = user_id
-        res.access_count = 0
-        await self.dbm.saveLink(res)
-        return res
+        values = {
+            "original_url": original_url,
+            "original_url_hash": get_url_hash(original_url),
+            "created_at": datetime.now().replace(tzinfo=None),
+            "expires_at": expires_at.replace(tzinfo=None) if expires_at else None,
+            "custom_alias": custom_alias,
+            "user_id": user_id,
+            "access_count": 0,
+            "is_permanent": permanent,
+        }
+        # при коллизии кода с другой ссылкой пробуем следующий код
+        variant = link_variant(values)
+        for attempt in range(SHORT_CODE_MAX_ATTEMPTS):
+            values["short_code"] = await code_generator.generate(original_url, attempt, variant)
+            status, link = await self.dbm.insertLink(values)
+            if status != LINK_CODE_CONFLICT:
+                break
+        else:
+            return "could not generate unique short code"
+        if status == LINK_ALIAS_CONFLICT:
+            return "custom_alias already exist"
+        if status == LINK_CREATED:
+            link_filter.add(link.short_code, link.custom_alias)
+            replica_router.mark_written(link.short_code, link.custom_alias, url_key(original_url), user_key(user_id))
+        # для LINK_EXISTS возвращается уже существующая ссылка с теми же параметрами
+        return link
+
+    async def create_links(self, items: list, user_id: Optional[int] = None) -> list[tuple[str, Optional[str]]]:
+        """
+        Создает пачку ссылок: один запрос на поиск уже существующих URL и занятых кодов/alias
+        и один многострочный INSERT на каждую попытку генерации кодов.
+        items - объекты с полями original_url, custom_alias, expires_at и permanent (LinkCreate).
+        Возвращает (статус, short_code) для каждой ссылки в порядке items.
+        """
+        created_at = datetime.now().replace(tzinfo=None)
+        rows = [{
+            "original_url": item.original_url,
+            "original_url_hash": get_url_hash(item.original_url),
+            "created_at": created_at,
+            "expires_at": item.expires_at.replace(tzinfo=None) if item.expires_at else None,
+            "custom_alias": item.custom_alias,
+            "user_id": user_id,
+            "access_count": 0,
+            "is_permanent": item.permanent,
+        } for item in items]
+        results: list[Optional[tuple[str, Optional[str]]]] = [None] * len(rows)
+
+        pending = list(range(len(rows)))
+        for attempt in range(SHORT_CODE_MAX_ATTEMPTS):
+            if not pending:
+                break
+            for i in pending:
+                rows[i]["short_code"] = await code_generator.generate(rows[i]["original_url"], attempt,
+                                                                      link_variant(rows[i]))
+            existing = await self.dbm.getLinkConflicts([rows[i] for i in pending])
+            by_identity = {link_identity(row._mapping): row.short_code for row in existing}
+            by_code = {row.short_code for row in existing}
+            by_alias = {row.custom_alias for row in existing if row.custom_alias}
+
+            retry, to_insert, duplicates, first_by_identity, batch_codes = [], [], [], {}, set()
+            for i in pending:
+                row = rows[i]
+                identity = link_identity(row)
+                if identity in by_identity:
+                    results[i] = (LINK_EXISTS, by_identity[identity])
+                elif row["custom_alias"] and row["custom_alias"] in by_alias:
+                    results[i] = (LINK_ALIAS_CONFLICT, None)
+                elif row["short_code"] in by_code:
+                    retry.append(i)
+                elif identity in first_by_identity:
+                    # повтор той же ссылки внутри пачки - получит код первой
+                    duplicates.append(i)
+                elif row["short_code"] in batch_codes:
+                    # другая ссылка пачки уже заняла этот код (например, тот же URL с другим alias) - новый код
+                    retry.append(i)
+                else:
+                    first_by_identity[identity] = i
+                    batch_codes.add(row["short_code"])
+                    to_insert.append(i)
+
+            inserted = await self.dbm.insertLinksIgnore([rows[i] for i in to_insert])
+            for i in to_insert:
+                if (rows[i]["short_code"], *link_identity(rows[i])) in inserted:
+                    results[i] = (LINK_CREATED, rows[i]["short_code"])
+                    link_filter.add(rows[i]["short_code"], rows[i]["custom_alias"])
+                    replica_router.mark_written(rows[i]["short_code"], rows[i]["custom_alias"],
+                                                url_key(rows[i]["original_url"]), user_key(user_id))
+                else:
+                    # не вставлена из-за конфликта внутри пачки или с параллельной вставкой - разберемся на следующем шаге
+                    retry.append(i)
+            for i in duplicates:
+                first = results[first_by_identity[link_identity(rows[i])]]
+                if first is not None:
+                    results[i] = (LINK_EXISTS, first[1])
+                else:
+                    retry.append(i)
+            pending = sorted(retry)
+
+        for i in pending:
+            results[i] = (LINK_CODE_CONFLICT, None)
+        return results
 
     async def get_link_and_visit_by_short_code(self, short_code: str) -> Link:
         await self.dbm.visitLink(short_code)
         res = await self.dbm.getLinkByCode(short_code)
         return res
 
+    async def visit_link(self, short_code: str) -> bool:
+        res = await self.dbm.visitLink(short_code)
+        return res
+
     async def get_link_by_short_code(self, short_code: str) -> Link:
         res = await self.dbm.getLinkByCode(short_code)
         return res
 
+    async def get_links_by_keys(self, short_codes: list[str], custom_aliases: list[str]) -> list[Link]:
+        """
+        Возвращает ссылки по спискам коротких кодов и alias одним запросом.
+        """
+        if not short_codes and not custom_aliases:
+            return []
+        res = await self.dbm.getLinksByKeys(short_codes, custom_aliases)
+        return res
+
     async def get_link_by_custom_alias(self, custom_alias: str) -> Link:
         res = await self.dbm.getLinkByAlias(custom_alias)
         return res
@@ -105,101 +402,332 @@ class LinkManager:
         res = await self.dbm.getLinkByUrl(url)
         return res
 
+    async def get_user_links(self, user_id: int, sort: str = "created_at", descending: bool = True,
+                             after: Optional[tuple] = None, limit: int = 50) -> list[Link]:
+        """
+        Возвращает страницу ссылок пользователя, отсортированных по sort (created_at или access_count) и id.
+        after - (значение sort, id) последней ссылки предыдущей страницы.
+        """
+        res = await self.dbm.getUserLinks(user_id, sort, descending, after, limit)
+        return res
+
 
     async def delete_link_by_short_code(self, short_code: str) -> bool:
-        res = await self.dbm.deleteLinkByCode(short_code)
-        return res
+        deleted = await self.dbm.deleteLinkByCode(short_code)
+        if deleted is None:
+            return False
+        negative_cache.put(short_code, deleted.custom_alias)
+        replica_router.mark_written(short_code, deleted.custom_alias)
+        await invalidate_link_keys(short_code, deleted.custom_alias)
+        return True
 
     async def delete_link_by_custom_alias(self, custom_alias: str) -> bool:
-        res = await self.dbm.deleteLinkByAlias(custom_alias)
-        return res
+        short_code = await self.dbm.deleteLinkByAlias(custom_alias)
+        if short_code is None:
+            return False
+        negative_cache.put(short_code, custom_alias)
+        replica_router.mark_written(short_code, custom_alias)
+        await invalidate_link_keys(short_code, custom_alias)
+        return True
 
     async def update_link(self, short_code: str, newUrl: str) -> Link:
         res = await self.dbm.updateLink(short_code, newUrl)
+        if res:
+            replica_router.mark_written(short_code, res.custom_alias, url_key(newUrl), user_key(res.user_id))
+        await invalidate_link_keys(short_code, res.custom_alias if res else None)
         return res
 
 class DBManager:
+    """
+    Операции с БД в рамках переданной сессии.
+    Сам сессии не открывает: все вызовы одного запроса идут через одно соединение и одну транзакцию.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
     # операции со ссылками
     async def saveLink(self, link: Link):
-        async with async_session() as sess:
-            sess.add(link)
-            await sess.flush()
-            await sess.commit()
+        self.session.add(link)
+        await self.session.commit()
+
+    async def insertLink(self, values: dict) -> tuple[str, Optional[Link]]:
+        """
+        Атомарно создает ссылку без предварительных проверок (INSERT ... ON CONFLICT DO NOTHING).
+        Возвращает статус (LINK_CREATED, LINK_EXISTS, LINK_ALIAS_CONFLICT, LINK_CODE_CONFLICT)
+        и созданную либо уже существующую ссылку.
+        """
+        links = Link.__table__
+        same_link = _same_link(links, values)
+        conflict = or_(links.c.short_code == values["short_code"], same_link)
+        if values.get("custom_alias"):
+            conflict = or_(conflict, links.c.custom_alias == values["custom_alias"])
+        # INSERT ... SELECT ... WHERE NOT EXISTS: ссылка, которая уже создана с теми же параметрами, повторно не вставляется
+        source = select(*[literal(value, links.c[name].type) for name, value in values.items()]).where(
+            ~select(links.c.id).where(same_link).correlate(None).exists())
+        insert = insert_ignore(links).from_select(list(values), source)
+
+        if engine.dialect.name == "postgresql":
+            # один запрос: вставка в CTE и строки, с которыми она конфликтует
+            ins = insert.returning(*links.c).cte("ins")
+            query = union_all(
+                select(literal(True).label("inserted"), *ins.c),
+                select(literal(False).label("inserted"), *links.c).where(conflict),
+            )
+            rows = (await self.session.execute(query)).all()
+        else:
+            query = insert.returning(literal(True).label("inserted"), *links.c)
+            rows = (await self.session.execute(query)).all()
+        if not rows:
+            # в SQLite конфликтующие строки выбираются отдельным запросом; в Postgres сюда попадаем, только
+            # если конфликтующую строку вставила параллельная транзакция уже после начала запроса
+            rows = (await self.session.execute(
+                select(literal(False).label("inserted"), *links.c).where(conflict))).all()
+        await self.session.commit()
+
+        status, row = _classify_insert(rows, values)
+        if row is None:
+            return status, None
+        return status, Link(**{c.name: row._mapping[c.name] for c in links.c})
+
+    async def getLinkConflicts(self, rows: list[dict]):
+        """
+        Возвращает существующие ссылки, с которыми конфликтуют новые строки: тот же URL, short_code или alias.
+        """
+        links = Link.__table__
+        conflict = or_(in_values(links.c.original_url_hash, {row["original_url_hash"] for row in rows}),
+                       in_values(links.c.short_code, {row["short_code"] for row in rows}))
+        aliases = {row["custom_alias"] for row in rows if row["custom_alias"]}
+        if aliases:
+            conflict = or_(conflict, in_values(links.c.custom_alias, aliases))
+        query = select(links.c.short_code, *[links.c[name] for name in LINK_IDENTITY]).where(conflict)
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def insertLinksIgnore(self, rows: list[dict]) -> set[tuple]:
+        """
+        Вставляет пачку ссылок одним INSERT ... ON CONFLICT DO NOTHING.
+        Возвращает (short_code, *LINK_IDENTITY) реально вставленных строк: у ссылок на один URL
+        с разными alias, сроком или типом редиректа может совпасть код, а вставится только одна из них.
+        """
+        if not rows:
+            return set()
+        links = Link.__table__
+        query = insert_ignore(links).values(rows).returning(
+            links.c.short_code, *[links.c[name] for name in LINK_IDENTITY])
+        inserted = (await self.session.execute(query)).all()
+        await self.session.commit()
+        return {(row.short_code, *link_identity(row._mapping)) for row in inserted}
+
+    async def _read(self, query, keys: tuple, fetch):
+        """
+        Читающий запрос: на реплике в отдельной короткой сессии, если реплики настроены и ключи keys
+        недавно не изменялись, иначе (а также при ошибке или пустом ответе реплики) - в сессии запроса.
+        fetch - функция, которая извлекает результат из Result.
+        """
+        replica = replica_router.choose(*keys)
+        if replica is not None:
+            try:
+                async with replica.session_factory() as session:
+                    value = fetch(await session.execute(query))
+                if value:
+                    replica_router.mark_read(True)
+                    return value
+                replica_router.fallbacks += 1
+            except REPLICA_ERRORS as e:
+                replica_router.mark_failed(replica, e)
+        replica_router.mark_read(False)
+        return fetch(await self.session.execute(query))
 
     async def getLinkByCode(self, code: str):
-        async with async_session() as session:
-            query = select(Link).where(Link.short_code == code)
-            result = await session.execute(query)
-            await session.commit()
-            await session.flush()
-            return result.scalars().first()
+        query = select(Link).where(Link.short_code == code)
+        return await self._read(query, (code,), lambda result: result.scalars().first())
 
     async def getLinkByAlias(self, custom_alias: str):
-        async with async_session() as session:
-            query = select(Link).where(Link.custom_alias == custom_alias)
-            result = await session.execute(query)
-            await session.commit()
-            await session.flush()
-            return result.scalars().first()
+        query = select(Link).where(Link.custom_alias == custom_alias)
+        return await self._read(query, (custom_alias,), lambda result: result.scalars().first())
+
+    async def getLinksByKeys(self, codes: list[str], aliases: list[str]):
+        conditions = []
+        if codes:
+            conditions.append(in_values(Link.short_code, codes))
+        if aliases:
+            conditions.append(in_values(Link.custom_alias, aliases))
+        return await self._read(select(Link).where(or_(*conditions)), (*codes, *aliases),
+                                lambda result: result.scalars().all())
 
     async def getLinkByUrl(self, url: str):
-        async with async_session() as session:
-            query = select(Link).where(Link.original_url == url)
-            result = await session.execute(query)
-            await session.commit()
-            await session.flush()
-            return result.scalars().first()
+        # поиск по индексу хэша, сравнение самого URL отсекает коллизии; ссылок на один URL может быть
+        # несколько (разные alias, срок, тип редиректа) - возвращается самая ранняя
+        query = (select(Link).where(Link.original_url_hash == get_url_hash(url), Link.original_url == url).
+                 order_by(Link.id).limit(1))
+        return await self._read(query, (url_key(url),), lambda result: result.scalars().first())
+
+    async def getUserLinks(self, user_id: int, sort: str, descending: bool, after: Optional[tuple], limit: int):
+        # keyset-пагинация по индексу (user_id, sort, id): страница начинается сразу после курсора,
+        # без OFFSET, поэтому ее стоимость не зависит от номера страницы
+        column = Link.__table__.c[sort]
+        key = tuple_(column, Link.id)
+        query = select(Link).where(Link.user_id == user_id)
+        if after is not None:
+            query = query.where(key < tuple_(*after) if descending else key > tuple_(*after))
+        if descending:
+            query = query.order_by(column.desc(), Link.id.desc())
+        else:
+            query = query.order_by(column, Link.id)
+        return await self._read(query.limit(limit), (user_key(user_id),), lambda result: result.scalars().all())
 
     async def visitLink(self, code: str):
-        async with async_session() as session:
-            await session.execute(update(Link).where(Link.short_code == code).
-                                  values(access_count=(Link.access_count + 1),
-                                         last_accessed_at=datetime.now().replace(tzinfo=None)))
-            await session.commit()
-            await session.flush()
-            return True
+        await self.session.execute(update(Link).where(Link.short_code == code).
+                                   values(access_count=(Link.access_count + 1),
+                                          last_accessed_at=datetime.now().replace(tzinfo=None)))
+        await self.session.commit()
+        return True
 
     async def deleteLinkByCode(self, code: str):
-        async with async_session() as session:
-            res = await session.execute(delete(Link).where(Link.short_code == code))
-            await session.commit()
-            return res.rowcount > 0
+        # возвращает удаленную строку (short_code, custom_alias), чтобы сбросить ссылку из кэша по обоим ключам
+        res = await self.session.execute(delete(Link).where(Link.short_code == code).
+                                         returning(Link.short_code, Link.custom_alias))
+        deleted = res.first()
+        await self.session.commit()
+        return deleted
 
     async def deleteLinkByAlias(self, custom_alias: str):
-        async with async_session() as session:
-            res = await session.execute(delete(Link).where(Link.custom_alias == custom_alias))
-            await session.commit()
-            return res.rowcount > 0
+        # возвращает short_code удаленной ссылки, чтобы можно было сбросить ее из кэша
+        res = await self.session.execute(delete(Link).where(Link.custom_alias == custom_alias).
+                                         returning(Link.short_code))
+        short_code = res.scalar_one_or_none()
+        await self.session.commit()
+        return short_code
 
     async def updateLink(self, code: str, newUrl: str):
-        async with async_session() as session:
-            res = await session.execute(update(Link).where(Link.short_code == code).
-                                        values(original_url=newUrl).
-                                        returning(Link))
-            await session.commit()
-            return res.scalar_one_or_none()
+        res = await self.session.execute(update(Link).where(Link.short_code == code).
+                                         values(original_url=newUrl, original_url_hash=get_url_hash(newUrl),
+                                                updated_at=datetime.utcnow()).
+                                         returning(Link))
+        link = res.scalar_one_or_none()
+        await self.session.commit()
+        return link
 
     # операции с пользователями
     async def saveUser(self, u: User):
-        async with async_session() as sess:
-            sess.add(u)
-            await sess.flush()
-            await sess.commit()
+        self.session.add(u)
+        await self.session.commit()
 
     async def getUser(self, u: User):
         return
 
+
+def _classify_insert(rows: list, values: dict) -> tuple[str, Optional[object]]:
+    for row in rows:
+        if row.inserted:
+            return LINK_CREATED, row
+    for row in rows:
+        if link_identity(row._mapping) == link_identity(values):
+            return LINK_EXISTS, row
+    for row in rows:
+        if row.short_code == values["short_code"]:
+            return LINK_CODE_CONFLICT, None
+    return LINK_ALIAS_CONFLICT, None
+
+
+@dataclass
+class ReaperStats:
+    """
+    Статистика очистки протухших ссылок.
+    """
+    runs: int = 0                     # проходов, выполненных этим воркером
+    total_purged: int = 0             # всего удалено строк
+    last_purged: int = 0              # удалено за последний проход
+    last_batches: int = 0             # пачек за последний проход
+    last_duration: float = 0.0        # длительность последнего прохода, сек
+    total_partitions_dropped: int = 0  # всего удалено секций link_stats
+    last_partitions_dropped: int = 0   # удалено секций за последний проход
+    last_run_at: Optional[datetime] = None
+
+
+reaper_stats = ReaperStats()
+
+
+async def _release_reaper_lock(conn):
+    """
+    Снимает advisory lock очистки. Транзакция после ошибки прервана, поэтому сначала откатывается.
+    Если снять блокировку не удалось, соединение закрывается, а не возвращается в пул: блокировка уровня
+    сессии иначе осталась бы на нем и остановила очистку на всех воркерах. Ошибка здесь не заменяет
+    исходную ошибку прохода.
+    """
+    try:
+        await conn.rollback()
+        await conn.execute(select(func.pg_advisory_unlock(REAPER_LOCK_ID)))
+        await conn.commit()
+    except Exception:
+        logger.exception("Could not release reaper lock, discarding connection")
+        await conn.invalidate()
+
+
+async def purgeExpiredLinks(batch_size: int = REAPER_BATCH_SIZE, pause: float = REAPER_BATCH_PAUSE) -> Optional[int]:
+    """
+    Один проход очистки: удаляет протухшие ссылки пачками по batch_size строк, каждая пачка - отдельная
+    короткая транзакция. Старые переходы из link_stats удаляются целыми секциями (см. maintain_partitions).
+    В Postgres проход выполняется под advisory lock, поэтому при нескольких воркерах его выполняет
+    только один. Возвращает число удаленных строк или None, если очистку уже выполняет другой воркер.
+    """
+    links = Link.__table__
+    is_postgres = engine.dialect.name == "postgresql"
+    purged = 0
+    batches = 0
+    async with engine.connect() as conn:
+        if is_postgres:
+            locked = await conn.scalar(select(func.pg_try_advisory_lock(REAPER_LOCK_ID)))
+            await conn.commit()
+            if not locked:
+                return None
+        try:
+            while True:
+                # выбираем пачку по индексу expires_at, строки, заблокированные другими транзакциями, пропускаем
+                batch = (select(links.c.id).where(links.c.expires_at < datetime.utcnow()).
+                         order_by(links.c.expires_at).limit(batch_size))
+                if is_postgres:
+                    batch = batch.with_for_update(skip_locked=True)
+                res = await conn.execute(delete(links).where(links.c.id.in_(batch.scalar_subquery())).
+                                         returning(links.c.short_code, links.c.custom_alias))
+                deleted = res.all()
+                await conn.commit()
+                await invalidate_link_keys(*[key for row in deleted for key in row])
+                purged += len(deleted)
+                batches += 1
+                observe_reaper_batch(len(deleted))
+                if len(deleted) < batch_size:
+                    break
+                await asyncio.sleep(pause)
+            if is_postgres:
+                reaper_stats.last_partitions_dropped = await maintain_partitions(conn, datetime.utcnow()) or 0
+        finally:
+            if is_postgres:
+                await _release_reaper_lock(conn)
+    reaper_stats.last_batches = batches
+    return purged
+
+
 async def deleteExpiredLinks():
     while True:
-        async with async_session() as session:
-            try:
-                query = delete(Link).where(Link.expires_at < datetime.utcnow())
-                await session.execute(query)
-                await session.commit()
-                print("[info] Expired links deleted")
-            except Exception as e:
-                print(f"[error] Error deleting expired links: {e}")
-                await session.rollback()
+        started = time.monotonic()
+        try:
+            purged = await purgeExpiredLinks()
+            if purged is None:
+                logger.debug("Expired links cleanup skipped: another worker holds the lock")
+            else:
+                duration = time.monotonic() - started
+                reaper_stats.runs += 1
+                reaper_stats.total_purged += purged
+                reaper_stats.last_purged = purged
+                reaper_stats.total_partitions_dropped += reaper_stats.last_partitions_dropped
+                reaper_stats.last_duration = duration
+                reaper_stats.last_run_at = datetime.utcnow()
+                logger.info("Expired links deleted: %d rows in %d batches, %.3f s",
+                            purged, reaper_stats.last_batches, duration)
+        except Exception:
+            logger.exception("Error deleting expired links")
 
         # раз во столько секунд происходит очистка протухших ссылок
-        await asyncio.sleep(100)
\ No newline at end of file
+        await asyncio.sleep(REAPER_INTERVAL)
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select
+
+from auth.clicks import click_buffer
+from auth.database import fetch_rows
+from config import EXPORT_PAGE_SIZE
+from models.models import Link
+
+links = Link.__table__
+
+EXPORT_COLUMNS = (
+    "id", "short_code", "custom_alias", "original_url", "user_id",
+    "created_at", "expires_at", "last_accessed_at", "access_count",
+)
+
+# Фильтр по сроку действия
+EXPORT_STATUSES = ("all", "active", "expired")
+
+
+async def iter_link_pages(
+        user_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        status: str = "all",
+        after_id: int = 0,
+        page_size: int = EXPORT_PAGE_SIZE,
+) -> AsyncIterator[list[dict]]:
+    """
+    Обходит таблицу links по возрастанию id страницами по page_size строк (keyset-пагинация:
+    WHERE id > последний id ORDER BY id LIMIT n). Каждая страница читается в отдельной короткой
+    транзакции (на реплике, если они настроены), поэтому экспорт любого размера не держит
+    соединение и снимок БД открытыми и не мешает очистке протухших ссылок. Память ограничена одной страницей.
+    Фильтры: владелец, интервал created_at [created_from, created_to), active/expired на момент начала экспорта.
+    """
+    now = datetime.utcnow()
+    conditions = []
+    if user_id is not None:
+        conditions.append(links.c.user_id == user_id)
+    if created_from is not None:
+        conditions.append(links.c.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(links.c.created_at < created_to)
+    if status == "active":
+        conditions.append(or_(links.c.expires_at.is_(None), links.c.expires_at >= now))
+    elif status == "expired":
+        conditions.append(links.c.expires_at < now)
+
+    last_id = after_id
+    while True:
+        query = (select(*[links.c[name] for name in EXPORT_COLUMNS]).
+                 where(links.c.id > last_id, *conditions).
+                 order_by(links.c.id).
+                 limit(page_size))
+        rows = await fetch_rows(query)
+        if not rows:
+            return
+        page = []
+        for row in rows:
+            item = row._asdict()
+            # добавляем переходы, которые еще не успели записаться в БД
+            pending_count, pending_accessed_at = click_buffer.pending(item["short_code"])
+            item["access_count"] = (item["access_count"] or 0) + pending_count
+            item["last_accessed_at"] = pending_accessed_at or item["last_accessed_at"]
+            page.append(item)
+        yield page
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1].id
+
+
+async def export_ndjson(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    async for page in pages:
+        yield "".join(json.dumps(item, default=datetime.isoformat, ensure_ascii=False) + "\n"
+                      for item in page).encode()
+
+
+async def export_csv(pages: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    async for page in pages:
+        writer.writerows(page)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select
+
+from auth.cache import CachedLink
+from config import HOT_LINKS_SIZE, HOT_LINKS_REFRESH_INTERVAL
+from models.models import Link
+
+logger = logging.getLogger(__name__)
+
+links = Link.__table__
+
+
+def hot_links_query(limit: int):
+    """
+    limit самых посещаемых действующих ссылок: обратный проход по индексу access_count.
+    """
+    return (select(links.c.id, links.c.short_code, links.c.custom_alias, links.c.original_url,
+                   links.c.expires_at, links.c.is_permanent).
+            where(links.c.access_count > 0,
+                  or_(links.c.expires_at.is_(None), links.c.expires_at >= datetime.utcnow())).
+            order_by(links.c.access_count.desc()).
+            limit(limit))
+
+
+class HotLinkSet:
+    """
+    Закрепленный набор самых посещаемых ссылок (по access_count) под short_code и custom_alias.
+    В отличие от LRU-кэша, его записи не вытесняются потоком редких ссылок и не истекают по TTL:
+    набор целиком пересчитывается раз в refresh_interval секунд и атомарно заменяется.
+    Изменения и удаления ссылок этим воркером убирают их из набора сразу (invalidate),
+    изменения на других воркерах видны после следующего пересчета.
+    """
+
+    def __init__(self, fetch, size: int = HOT_LINKS_SIZE, refresh_interval: float = HOT_LINKS_REFRESH_INTERVAL):
+        self.fetch = fetch
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._links: dict[str, CachedLink] = {}
+        # ключи, сброшенные во время пересчета, - не попадают в новый набор
+        self._invalidated_during_refresh: Optional[set[str]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.runs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def get(self, key: str) -> Optional[CachedLink]:
+        link = self._links.get(key)
+        if link is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return link
+
+    def invalidate(self, *keys: Optional[str]):
+        for key in keys:
+            if key:
+                self._links.pop(key, None)
+                if self._invalidated_during_refresh is not None:
+                    self._invalidated_during_refresh.add(key)
+
+    async def refresh(self):
+        """
+        Пересчитывает набор по БД.
+        """
+        self._invalidated_during_refresh = set()
+        try:
+            rows = await self.fetch(hot_links_query(self.size))
+            hot: dict[str, CachedLink] = {}
+            for row in rows:
+                link = CachedLink(
+                    short_code=row.short_code,
+                    original_url=row.original_url,
+                    expires_at=row.expires_at,
+                    link_id=row.id,
+                    permanent=bool(row.is_permanent),
+                )
+                if row.custom_alias:
+                    hot.setdefault(row.custom_alias, link)
+                # если ключ совпал с кодом одной ссылки и alias другой, приоритет у короткого кода
+                hot[row.short_code] = link
+            for key in self._invalidated_during_refresh:
+                hot.pop(key, None)
+        finally:
+            self._invalidated_during_refresh = None
+        self._links = hot
+        self.runs += 1
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error refreshing hot links")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._links),
+            "max_size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "runs": self.runs,
+            "hit_ratio": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+        }
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from config import REDIRECT_PERMANENT_MAX_AGE, REDIRECT_TEMPORARY_MAX_AGE
+
+
+def redirect_cache_policy(permanent: bool, expires_at: Optional[datetime], now: datetime) -> tuple[int, str]:
+    """
+    Код ответа и Cache-Control для редиректа. Постоянная ссылка - 301 с кэшированием на
+    REDIRECT_PERMANENT_MAX_AGE секунд, временная - 302 (по умолчанию не кэшируется).
+    max-age не выходит за expires_at, чтобы после истечения срока запрос дошел до сервера и получил 410.
+    """
+    max_age = REDIRECT_PERMANENT_MAX_AGE if permanent else REDIRECT_TEMPORARY_MAX_AGE
+    if expires_at is not None:
+        max_age = min(max_age, int((expires_at - now).total_seconds()))
+    status = 301 if permanent else 302
+    if max_age <= 0:
+        return status, "no-store"
+    return status, f"{'public' if permanent else 'private'}, max-age={max_age}"
+
+
+def http_date(moment: datetime) -> str:
+    # время в БД хранится без часового пояса, в UTC
+    return format_datetime(moment.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since при наличии If-None-Match не учитывается (RFC 9110)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def conditional_response(request: Request, content: BaseModel, last_modified: Optional[datetime] = None) -> Response:
+    """
+    JSON-ответ с ETag (хэш тела) и Last-Modified. Если у клиента уже есть актуальная версия
+    (If-None-Match / If-Modified-Since), возвращается 304 без тела.
+    """
+    body = content.model_dump_json().encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    # клиент может хранить ответ, но перед использованием обязан его перепроверить
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,11 +1,16 @@
+import logging
+
 from fastapi import Depends
-from fastapi_users.manager import BaseUserManager, UUIDIDMixin
+from fastapi_users.manager import BaseUserManager, IntegerIDMixin
+from auth.cache import user_token_cache
 from auth.database import User, get_user_db
 
 SECRET = "SECRET"  # Секретный ключ для UserManager
 
+logger = logging.getLogger(__name__)
+
 
-class UserManager(UUIDIDMixin, BaseUserManager[User, int]):
+class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     """
     Менеджер пользователей для FastAPI-Users.
     """
@@ -16,19 +21,44 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, int]):
         """
         Действие после регистрации пользователя.
         """
-        print(f"Пользователь {user.id} успешно зарегистрирован.")
+        logger.info("Пользователь %s успешно зарегистрирован.", user.id)
+
+    async def on_after_update(self, user: User, update_dict: dict, request=None):
+        """
+        Действие после изменения пользователя: сбрасываем его токены из кэша,
+        чтобы изменения (в том числе деактивация) применились сразу.
+        """
+        user_token_cache.invalidate_user(user.id)
+
+    async def on_after_delete(self, user: User, request=None):
+        """
+        Действие после удаления пользователя.
+        """
+        user_token_cache.invalidate_user(user.id)
+
+    async def on_after_reset_password(self, user: User, request=None):
+        """
+        Действие после сброса пароля.
+        """
+        user_token_cache.invalidate_user(user.id)
+
+    async def on_after_verify(self, user: User, request=None):
+        """
+        Действие после верификации: is_verified меняется без on_after_update, сбрасываем токены из кэша.
+        """
+        user_token_cache.invalidate_user(user.id)
 
     async def on_after_forgot_password(self, user: User, token: str, request=None):
         """
         Действие после запроса на сброс пароля.
         """
-        print(f"Ссылка для сброса пароля отправлена пользователю {user.id}. Токен: {token}")
+        logger.info("Ссылка для сброса пароля отправлена пользователю %s. Токен: %s", user.id, token)
 
     async def on_after_request_verify(self, user: User, token: str, request=None):
         """
         Действие после запроса верификации пользователя.
         """
-        print(f"Ссылка для верификации отправлена пользователю {user.id}. Токен: {token}")
+        logger.info("Ссылка для верификации отправлена пользователю %s. Токен: %s", user.id, token)
 
 
 async def get_user_manager(user_db=Depends(get_user_db)):
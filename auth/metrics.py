@@ -0,0 +1,213 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Границы корзин гистограмм задержек, сек
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Полное время обработки HTTP-запроса",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Время запроса, проведенное в обращениях к БД",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_APP_TIME = Histogram(
+    "http_request_app_seconds", "Время запроса без обращений к БД (обработка в приложении)",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Время выполнения одного SQL-запроса", buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание свободного соединения в пуле", buckets=LATENCY_BUCKETS,
+)
+REAPER_BATCH_ROWS = Histogram(
+    "reaper_batch_rows", "Строк, удаленных одной пачкой очистки протухших ссылок",
+    buckets=(0, 1, 10, 100, 500, 1000, 5000, 10000),
+)
+REAPER_PURGED = Counter("reaper_purged_rows", "Всего удалено протухших ссылок")
+RATE_LIMITED = Counter("rate_limited_requests", "Запросы, отклоненные ограничением частоты", ["rule"])
+
+
+class RequestTimings:
+    """
+    Время, которое текущий запрос провел в БД.
+    """
+    __slots__ = ("db_time",)
+
+    def __init__(self):
+        self.db_time = 0.0
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class StartupTimings:
+    """
+    Время запуска воркера от загрузки приложения: каждого этапа прогрева, до готовности (readiness)
+    и до первого запроса (кроме проб /health/). Отдается в /metrics и /health/ready.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases: dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+        self.first_request_after: Optional[float] = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def mark_ready(self):
+        self.ready_after = self.elapsed()
+
+    def mark_request(self):
+        self.first_request_after = self.elapsed()
+
+    def stats(self) -> dict:
+        stats = {
+            "ready": int(self.ready),
+            "time_to_ready_seconds": self.ready_after or 0.0,
+            "time_to_first_request_seconds": self.first_request_after or 0.0,
+        }
+        stats.update({f"{name}_seconds": seconds for name, seconds in self.phases.items()})
+        return stats
+
+
+# Время запуска этого воркера
+startup_timings = StartupTimings()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: гистограммы задержки по шаблону маршрута (например /links/{short_code}),
+    отдельно время в БД и время обработки в приложении.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if startup_timings.first_request_after is None and not scope["path"].startswith("/health/"):
+            startup_timings.mark_request()
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_timings.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(elapsed)
+            REQUEST_DB_TIME.labels(method, route).observe(timings.db_time)
+            REQUEST_APP_TIME.labels(method, route).observe(max(elapsed - timings.db_time, 0.0))
+
+
+def route_label(scope) -> str:
+    """
+    Шаблон пути маршрута вместо самого пути, чтобы не плодить метки на каждый short_code.
+    """
+    if "metrics_route" in scope:
+        return scope["metrics_route"]
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+def instrument_engine(engine):
+    """
+    Подключает замер времени SQL-запросов к движку SQLAlchemy.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_LATENCY.observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.db_time += elapsed
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет ожидание свободного соединения при checkout.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def observe_reaper_batch(rows: int):
+    REAPER_BATCH_ROWS.observe(rows)
+    REAPER_PURGED.inc(rows)
+
+
+class StatsCollector:
+    """
+    Отдает в /metrics счетчики, которые компоненты приложения и так ведут у себя
+    (кэши, очереди, пул соединений), читая их в момент запроса метрик.
+    sources - имя компонента -> функция, возвращающая словарь числовых показателей.
+    Показатели с именами из counters экспортируются как counter, остальные - как gauge.
+    """
+
+    def __init__(self, sources: dict[str, Callable[[], dict]], counters: tuple[str, ...] = ()):
+        self.sources = sources
+        self.counters = set(counters)
+
+    def collect(self):
+        for component, source in self.sources.items():
+            for key, value in source().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"app_{component}_{key}"
+                if key in self.counters:
+                    metric = CounterMetricFamily(name, f"{component}: {key}")
+                else:
+                    metric = GaugeMetricFamily(name, f"{component}: {key}")
+                metric.add_metric([], value)
+                yield metric
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
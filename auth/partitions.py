@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from config import LINK_STATS_RETENTION_MONTHS, LINK_STATS_PARTITIONS_AHEAD
+
+logger = logging.getLogger(__name__)
+
+# Таблица переходов в Postgres секционирована по месяцам accessed_at (миграция 0009).
+# Секция за месяц называется link_stats_pГГГГ_ММ; link_stats_default принимает строки
+# вне созданных секций и в норме пуста.
+PARENT = "link_stats"
+DEFAULT_PARTITION = f"{PARENT}_default"
+
+# удаление секции ненадолго блокирует всю таблицу: не ждем дольше, чем lock_timeout, и пробуем в следующий проход
+DROP_LOCK_TIMEOUT = "1s"
+
+_PARTITIONED_QUERY = text(f"SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('{PARENT}')")
+_PARTITIONS_QUERY = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    f"WHERE i.inhparent = to_regclass('{PARENT}')"
+)
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """
+    Месяц секции по ее имени или None для link_stats_default и посторонних таблиц.
+    """
+    prefix = f"{PARENT}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], "%Y_%m")
+    except ValueError:
+        return None
+
+
+def create_partition_sql(month: datetime) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')")
+
+
+async def maintain_partitions(conn, now: datetime, ahead: int = LINK_STATS_PARTITIONS_AHEAD,
+                              retention: int = LINK_STATS_RETENTION_MONTHS) -> Optional[int]:
+    """
+    Создает секции на текущий и ahead следующих месяцев и удаляет секции, целиком старше retention месяцев
+    (DROP TABLE вместо DELETE: ни мертвых строк, ни работы для VACUUM). Агрегаты переходов
+    (link_click_rollups) при этом сохраняются. Возвращает число удаленных секций
+    или None, если таблица не секционирована.
+    """
+    if not await conn.scalar(_PARTITIONED_QUERY):
+        return None
+    current = month_start(now)
+    for offset in range(ahead + 1):
+        await conn.execute(text(create_partition_sql(add_months(current, offset))))
+    await conn.commit()
+    if retention <= 0:
+        return 0
+
+    oldest = add_months(current, -retention)
+    names = (await conn.execute(_PARTITIONS_QUERY)).scalars().all()
+    dropped = 0
+    for name in sorted(names):
+        month = partition_month(name)
+        if month is None or month >= oldest:
+            continue
+        try:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{DROP_LOCK_TIMEOUT}'"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            await conn.commit()
+        except Exception as e:
+            await conn.rollback()
+            logger.warning("Could not drop partition %s, retrying next run: %r", name, e)
+            continue
+        dropped += 1
+        logger.info("Dropped link_stats partition %s", name)
+    return dropped
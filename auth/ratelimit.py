@@ -0,0 +1,317 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from starlette.requests import cookie_parser
+
+from auth.auth import cookie_transport, get_token_user_id
+from auth.metrics import RATE_LIMITED
+from config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_URL, RATE_LIMIT_SHORTEN_RATE, RATE_LIMIT_SHORTEN_BURST, RATE_LIMIT_REDIRECT_RATE,
+    RATE_LIMIT_REDIRECT_BURST, RATE_LIMIT_LINK_RATE, RATE_LIMIT_LINK_BURST, RATE_LIMIT_MAX_BUCKETS,
+    RATE_LIMIT_TRUSTED_PROXIES, SHARED_CACHE_TIMEOUT, SHARED_CACHE_RETRY_AFTER,
+)
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis нужен только для RATE_LIMIT_URL=redis://...
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_EXCEEDED = "Слишком много запросов"
+
+
+class BucketStore:
+    """
+    Хранилище корзин токенов. take забирает токен из корзины key и возвращает 0, если запрос
+    разрешен, иначе - через сколько секунд в корзине появится токен.
+    """
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return 0
+
+    async def close(self):
+        pass
+
+
+def _refill(tokens: float, elapsed: float, rate: float, burst: int) -> tuple[float, float]:
+    tokens = min(burst, tokens + elapsed * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Корзины в памяти воркера: key -> (токены, время обновления) в порядке последнего обращения.
+    Корзина, к которой не обращались дольше burst / rate секунд, уже полная и ничем не отличается
+    от отсутствующей, поэтому такие корзины удаляются с начала очереди при каждом обращении.
+    При переполнении max_size вытесняются самые давние корзины.
+    """
+
+    def __init__(self, max_size: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_size = max_size
+        # по корзинам на каждое правило: у правил разное время, за которое корзина наполняется
+        self._buckets: dict[tuple[float, int], OrderedDict[str, tuple[float, float]]] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        buckets = self._buckets.setdefault((rate, burst), OrderedDict())
+        tokens, updated = buckets.pop(key, (burst, now))
+        tokens, wait = _refill(tokens, now - updated, rate, burst)
+        buckets[key] = (tokens, now)
+        self._expire(buckets, now - burst / rate)
+        return wait
+
+    def _expire(self, buckets: OrderedDict, idle_before: float):
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if updated >= idle_before and len(buckets) <= self.max_size:
+                break
+            del buckets[key]
+
+    def size(self) -> int:
+        return sum(len(buckets) for buckets in self._buckets.values())
+
+
+# Корзина в Redis - хэш {tokens, ts}; время берется у Redis, чтобы у всех воркеров были одни часы.
+# Ключ живет burst / rate секунд без обращений - после этого корзина все равно полная
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """
+    Общие для всех воркеров корзины в Redis: одна атомарная операция (Lua-скрипт) на запрос.
+    При ошибке Redis лимит считается по корзинам в памяти воркера, а сам Redis не используется
+    retry_after секунд - как и общий кэш ссылок.
+    """
+
+    def __init__(self, url: str, timeout: float = SHARED_CACHE_TIMEOUT, retry_after: float = SHARED_CACHE_RETRY_AFTER):
+        if redis_asyncio is None:
+            raise RuntimeError("Для RATE_LIMIT_URL=redis://... нужен пакет redis")
+        self.client = redis_asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(_TAKE_SCRIPT)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.fallback = MemoryBucketStore()
+        self._disabled_until = 0.0
+        self.errors = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        if self._disabled_until <= time.monotonic():
+            try:
+                wait = await asyncio.wait_for(self.script(keys=[f"rl:{key}"], args=[rate, burst]), self.timeout)
+                return float(wait)
+            except Exception as e:
+                self.errors += 1
+                self._disabled_until = time.monotonic() + self.retry_after
+                logger.warning("Rate limit store unavailable, limiting per worker: %r", e)
+        return await self.fallback.take(key, rate, burst)
+
+    def size(self) -> int:
+        return self.fallback.size()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_bucket_store(url: str = RATE_LIMIT_URL) -> BucketStore:
+    """
+    Создает хранилище корзин по RATE_LIMIT_URL: пустая строка - в памяти воркера, redis://... - общее.
+    """
+    if not url:
+        return MemoryBucketStore()
+    return RedisBucketStore(url)
+
+
+@dataclass
+class RateLimitRule:
+    """
+    Правило ограничения: key по ASGI scope возвращает ключ корзины или None, если правило
+    к запросу не относится.
+    """
+    name: str
+    rate: float
+    burst: int
+    key: Callable[[dict], Optional[str]]
+
+
+# Прокси, которым разрешено передавать адрес клиента в X-Forwarded-For
+trusted_proxies = [ipaddress.ip_network(net, strict=False) for net in RATE_LIMIT_TRUSTED_PROXIES]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in net for net in trusted_proxies)
+
+
+def client_ip(scope, forwarded_for: Optional[str]) -> str:
+    """
+    IP-адрес клиента. X-Forwarded-For учитывается, только если запрос пришел от доверенного прокси:
+    адреса в заголовке просматриваются справа налево, клиент - первый адрес не из доверенных
+    (левые значения клиент может подставить сам).
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if forwarded_for is None or not _is_trusted(address):
+        return address
+    for hop in reversed(forwarded_for.split(",")):
+        address = hop.strip()
+        if not _is_trusted(address):
+            break
+    return address
+
+
+def client_key(scope) -> str:
+    """
+    Клиент запроса: авторизованный пользователь (по проверенному JWT из cookie, без обращения к БД)
+    или IP-адрес.
+    """
+    cookie = forwarded_for = None
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookie = value.decode("latin-1")
+        elif name == b"x-forwarded-for":
+            # несколько заголовков равнозначны одному со списком через запятую
+            forwarded_for = value.decode("latin-1") if forwarded_for is None \
+                else f"{forwarded_for},{value.decode('latin-1')}"
+    if cookie is not None:
+        token = cookie_parser(cookie).get(cookie_transport.cookie_name)
+        user_id = get_token_user_id(token) if token else None
+        if user_id is not None:
+            return f"user:{user_id}"
+    return f"ip:{client_ip(scope, forwarded_for)}"
+
+
+def default_rules(reserved: frozenset = frozenset()) -> list[RateLimitRule]:
+    """
+    Правила из config.py. reserved - статические маршруты /links/<имя>, которые не являются
+    короткими кодами (как у FastRedirectMiddleware).
+    """
+    def redirect_code(scope) -> Optional[str]:
+        path = scope["path"]
+        if scope["method"] != "GET" or not path.startswith("/links/"):
+            return None
+        code = path[len("/links/"):]
+        return code if code and "/" not in code and code not in reserved else None
+
+    def shorten_client(scope) -> Optional[str]:
+        if scope["method"] == "POST" and scope["path"].startswith("/links/shorten"):
+            return client_key(scope)
+        return None
+
+    def redirect_client(scope) -> Optional[str]:
+        return client_key(scope) if redirect_code(scope) is not None else None
+
+    rules = [
+        RateLimitRule("shorten", RATE_LIMIT_SHORTEN_RATE, RATE_LIMIT_SHORTEN_BURST, shorten_client),
+        RateLimitRule("redirect_client", RATE_LIMIT_REDIRECT_RATE, RATE_LIMIT_REDIRECT_BURST, redirect_client),
+        RateLimitRule("redirect_link", RATE_LIMIT_LINK_RATE, RATE_LIMIT_LINK_BURST, redirect_code),
+    ]
+    return [rule for rule in rules if rule.rate > 0]
+
+
+class RateLimiter:
+    """
+    Хранилище корзин и счетчики разрешенных и отклоненных запросов.
+    """
+
+    def __init__(self, store: Optional[BucketStore] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store or create_bucket_store()
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+
+    async def check(self, scope, rules: list[RateLimitRule]) -> Optional[tuple[RateLimitRule, float]]:
+        """
+        Проверяет запрос по всем подходящим правилам. Возвращает первое нарушенное правило
+        и время до появления токена или None, если запрос разрешен.
+        """
+        for rule in rules:
+            key = rule.key(scope)
+            if key is None:
+                continue
+            wait = await self.store.take(f"{rule.name}:{key}", rule.rate, rule.burst)
+            if wait > 0:
+                self.limited += 1
+                RATE_LIMITED.labels(rule.name).inc()
+                return rule, wait
+        self.allowed += 1
+        return None
+
+    async def close(self):
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buckets": self.store.size(),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": getattr(self.store, "errors", 0),
+        }
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware, которое отклоняет запросы сверх лимита ответом 429 с Retry-After
+    до маршрутизации и до открытия сессии БД. Подключается снаружи FastRedirectMiddleware.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, rules: list[RateLimitRule]):
+        self.app = app
+        self.limiter = limiter
+        self.rules = rules
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.limiter.enabled and self.rules:
+            rejected = await self.limiter.check(scope, self.rules)
+            if rejected is not None:
+                await self.reject(send, rejected[1])
+                return
+        await self.app(scope, receive, send)
+
+    async def reject(self, send, wait: float):
+        body = json.dumps({"detail": RATE_LIMIT_EXCEEDED}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(max(1, math.ceil(wait))).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Общий для приложения ограничитель частоты запросов
+rate_limiter = RateLimiter()
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime
+from typing import Optional
+from urllib.parse import quote
+
+from sqlalchemy import bindparam, or_, select
+
+from auth.cache import CachedLink, link_cache, negative_cache, shared_cache
+from auth.clicks import click_buffer, click_events
+from auth.database import fetch_rows, hot_links, link_filter, replica_router
+from auth.http_cache import redirect_cache_policy
+from models.models import Link
+
+LINK_NOT_FOUND = "Ссылка не найдена"
+LINK_EXPIRED = "Срок действия ссылки истек"
+
+links = Link.__table__
+
+# Запрос строится один раз: SQLAlchemy переиспользует его скомпилированную форму, а выбираются
+# только нужные для редиректа колонки в виде обычной строки, без создания ORM-объекта.
+# Ключ ищется и среди коротких кодов, и среди alias: оба столбца уникальны и проиндексированы,
+# поэтому OR выполняется по двум индексам (BitmapOr в Postgres) и возвращает не больше двух строк
+_redirect_query = (select(links.c.id, links.c.short_code, links.c.original_url, links.c.expires_at,
+                          links.c.is_permanent).
+                   where(or_(links.c.short_code == bindparam("key"), links.c.custom_alias == bindparam("key"))))
+
+
+async def resolve_link(key: str) -> Optional[CachedLink]:
+    """
+    Ищет ссылку для редиректа по короткому коду или alias: закрепленный набор самых посещаемых ссылок,
+    кэш воркера, затем общий кэш, затем БД. В общий кэш попадают только ссылки, прочитанные из primary.
+    Ключи, которых нет в Bloom-фильтре или которые недавно не нашлись в БД, отсеиваются
+    до общего кэша и БД. Найденная ссылка кэшируется под тем ключом, по которому ее запросили.
+    """
+    link = hot_links.get(key)
+    if link is not None:
+        return link
+    link = link_cache.get(key)
+    if link is not None:
+        return link
+    if not link_filter.might_exist(key) or negative_cache.contains(key):
+        return None
+    link = await shared_cache.get_link(key)
+    if link is None:
+        rows = await fetch_rows(_redirect_query, {"key": key}, (key,))
+        if not rows:
+            negative_cache.put(key)
+            return None
+        # если ключ совпал с кодом одной ссылки и alias другой, приоритет у короткого кода
+        row = next((row for row in rows if row.short_code == key), rows[0])
+        link = CachedLink(
+            short_code=row.short_code,
+            original_url=row.original_url,
+            expires_at=row.expires_at,
+            link_id=row.id,
+            permanent=bool(row.is_permanent),
+        )
+        # строка с реплики может отставать, а в общий кэш она попала бы для всех воркеров на SHARED_CACHE_TTL
+        if not replica_router.last_read_from_replica():
+            await shared_cache.set_link(link, key)
+    link_cache.put(link, key)
+    return link
+
+
+async def record_click(link: CachedLink, ip_address: Optional[str], user_agent: Optional[str],
+                       referrer: Optional[str]):
+    """
+    Учитывает переход: счетчик в буфере и событие в очереди link_stats.
+    """
+    click_buffer.add(link.short_code)
+    if link.link_id is not None:
+        await click_events.put(link.link_id, ip_address, user_agent, referrer)
+
+
+def redirect_location(url: str) -> str:
+    # то же экранирование, что и в starlette.responses.RedirectResponse
+    return quote(url, safe=":/%#?=@[]!$&'()*+,;")
+
+
+class FastRedirectMiddleware:
+    """
+    ASGI middleware, которое обслуживает GET /links/{short_code} (код или alias) напрямую: без маршрутизации
+    FastAPI, внедрения зависимостей, ORM и Pydantic. Ответы те же, что у redirect_to_original_url:
+    301/302 на оригинальный URL с Cache-Control, 404 и 410 с JSON {"detail": ...}.
+    reserved - имена статических маршрутов вида /links/<имя> (например search), которые
+    не являются короткими кодами и передаются дальше в приложение.
+    """
+
+    prefix = "/links/"
+
+    def __init__(self, app, reserved: frozenset = frozenset()):
+        self.app = app
+        self.reserved = reserved
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET" and scope["path"].startswith(self.prefix):
+            short_code = scope["path"][len(self.prefix):]
+            if short_code and "/" not in short_code and short_code not in self.reserved:
+                scope["metrics_route"] = "/links/{short_code}"
+                await self.redirect(scope, send, short_code)
+                return
+        await self.app(scope, receive, send)
+
+    async def redirect(self, scope, send, short_code: str):
+        link = await resolve_link(short_code)
+        if link is None:
+            await send_error(send, 404, LINK_NOT_FOUND)
+            return
+        headers = dict(scope["headers"])
+        client = scope.get("client")
+        await record_click(
+            link,
+            client[0] if client else None,
+            _header(headers, b"user-agent"),
+            _header(headers, b"referer"),
+        )
+        now = datetime.utcnow()
+        if link.is_expired(now):
+            await send_error(send, 410, LINK_EXPIRED)
+            return
+        status, cache_control = redirect_cache_policy(link.permanent, link.expires_at, now)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"location", redirect_location(link.original_url).encode("latin-1")),
+                        (b"cache-control", cache_control.encode()),
+                        (b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _header(headers: dict, name: bytes) -> Optional[str]:
+    value = headers.get(name)
+    return value.decode("latin-1") if value is not None else None
+
+
+async def send_error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from config import REPLICA_HEALTH_INTERVAL, REPLICA_HEALTH_TIMEOUT, REPLICA_MAX_LAG, READ_YOUR_WRITES_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики Postgres в секундах; 0, если все полученные изменения уже применены
+_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Получен ли последний результат чтения в текущей задаче с реплики
+_replica_read: ContextVar[bool] = ContextVar("replica_read", default=False)
+
+
+class Replica:
+    """
+    Реплика для чтения: движок, фабрика сессий и состояние проверки здоровья.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.errors = 0
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация читающих запросов: по кругу между здоровыми репликами, запись - только в primary.
+    Реплика исключается, если не отвечает на проверку, отстает больше чем на max_lag секунд
+    или на ней упал запрос, и возвращается после успешной проверки.
+    Read-your-writes: ключи (short_code, alias, URL, владелец), измененные этим воркером, в течение
+    window секунд читаются из primary. Для остальных ключей пустой ответ реплики перепроверяется
+    на primary, поэтому только что созданная на другом воркере ссылка не теряется из-за отставания.
+    Без реплик все запросы идут в primary.
+    """
+
+    def __init__(self, replicas: list[AsyncEngine], health_interval: float = REPLICA_HEALTH_INTERVAL,
+                 health_timeout: float = REPLICA_HEALTH_TIMEOUT, max_lag: float = REPLICA_MAX_LAG,
+                 window: float = READ_YOUR_WRITES_WINDOW, max_written: int = 100000):
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_lag = max_lag
+        self.window = window
+        self.max_written = max_written
+        self._next = itertools.count()
+        self._written: OrderedDict[str, float] = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self.fallbacks = 0
+
+    def choose(self, *keys: Optional[str]) -> Optional[Replica]:
+        """
+        Реплика для чтения по ключам keys или None, если читать нужно из primary.
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy or self._recently_written(keys):
+            self.primary_reads += 1
+            return None
+        self.replica_reads += 1
+        return healthy[next(self._next) % len(healthy)]
+
+    def _recently_written(self, keys) -> bool:
+        now = time.monotonic()
+        for key in keys:
+            deadline = self._written.get(key) if key else None
+            if deadline is not None:
+                if deadline >= now:
+                    return True
+                del self._written[key]
+        return False
+
+    def mark_written(self, *keys: Optional[str]):
+        """
+        Запоминает ключи, измененные в primary: ближайшие window секунд они читаются из primary.
+        """
+        if not self.replicas:
+            return
+        deadline = time.monotonic() + self.window
+        for key in keys:
+            if key:
+                self._written[key] = deadline
+                self._written.move_to_end(key)
+        while len(self._written) > self.max_written:
+            self._written.popitem(last=False)
+
+    def mark_read(self, from_replica: bool):
+        _replica_read.set(from_replica)
+
+    def last_read_from_replica(self) -> bool:
+        """
+        Получен ли последний прочитанный в текущей задаче результат с реплики. Такие строки могут отставать
+        от primary, а read-your-writes действует только в пределах воркера, поэтому в общий кэш они не пишутся.
+        """
+        return _replica_read.get()
+
+    def mark_failed(self, replica: Replica, error: Exception):
+        replica.healthy = False
+        replica.errors += 1
+        logger.warning("Replica %s failed, reading from primary: %r", replica.name, error)
+
+    async def _check(self, replica: Replica):
+        async with replica.engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                lag = await conn.scalar(_LAG_QUERY)
+                replica.lag = float(lag) if lag is not None else 0.0
+            else:
+                await conn.execute(text("SELECT 1"))
+                replica.lag = 0.0
+
+    async def check_health(self):
+        """
+        Проверяет все реплики: доступность и отставание от primary.
+        """
+        for replica in self.replicas:
+            was_healthy = replica.healthy
+            try:
+                await asyncio.wait_for(self._check(replica), self.health_timeout)
+                replica.healthy = replica.lag <= self.max_lag
+            except Exception as e:
+                replica.healthy = False
+                replica.errors += 1
+                logger.debug("Replica %s health check failed: %r", replica.name, e)
+            if replica.healthy != was_healthy:
+                logger.warning("Replica %s is %s (lag %s s)", replica.name,
+                               "healthy" if replica.healthy else "unhealthy", replica.lag)
+
+    async def run(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    def start(self):
+        if self.replicas:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(replica.healthy for replica in self.replicas),
+            "max_lag": max((replica.lag or 0.0 for replica in self.replicas), default=0.0),
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+            "fallbacks": self.fallbacks,
+            "errors": sum(replica.errors for replica in self.replicas),
+        }
@@ -1,11 +1,13 @@
 from typing import Optional
-from uuid import UUID
 
 from fastapi_users import schemas
 from pydantic import BaseModel, Field
 from datetime import datetime
 
-class UserRead(schemas.BaseUser[UUID]):
+from config import BULK_STATS_MAX_PAGE
+
+
+class UserRead(schemas.BaseUser[int]):
     """
     Схема для чтения информации о пользователе.
     """
@@ -44,6 +46,7 @@ class LinkCreate(BaseModel):
     original_url: str = Field(..., description="Оригинальный URL")
     custom_alias: Optional[str] = Field(None, description="Кастомный alias")
     expires_at: Optional[datetime] = Field(None, description="Дата истечения срока действия")
+    permanent: bool = Field(False, description="Постоянный редирект (301, кэшируется браузерами) вместо 302")
 
 
 class LinkResponse(BaseModel):
@@ -56,6 +59,7 @@ class LinkResponse(BaseModel):
     created_at: datetime = Field(..., description="Дата создания")
     expires_at: Optional[datetime] = Field(None, description="Дата истечения срока действия")
     access_count: int = Field(0, description="Количество переходов")
+    permanent: bool = Field(False, description="Постоянный редирект")
 
 
 class LinkStatsResponse(BaseModel):
@@ -76,4 +80,82 @@ class LinkSearch(BaseModel):
     custom_alias: Optional[str] = Field(None, description="Кастомный alias")
     original_url: str = Field(..., description="Оригинальный URL")
     created_at: datetime = Field(..., description="Дата создания")
-    expires_at: Optional[datetime] = Field(None, description="Дата истечения срока действия")
\ No newline at end of file
+    expires_at: Optional[datetime] = Field(None, description="Дата истечения срока действия")
+
+class BulkLinkResult(BaseModel):
+    """
+    Схема результата для одной ссылки при массовом сокращении.
+    """
+    index: int = Field(..., description="Порядковый номер ссылки во входных данных")
+    status: str = Field(..., description="created, exists, alias_conflict, code_conflict или invalid")
+    original_url: Optional[str] = Field(None, description="Оригинальный URL")
+    short_code: Optional[str] = Field(None, description="Короткий код ссылки")
+    custom_alias: Optional[str] = Field(None, description="Кастомный alias")
+    detail: Optional[str] = Field(None, description="Описание ошибки")
+
+
+class BulkStatsRequest(BaseModel):
+    """
+    Схема запроса статистики сразу по многим ссылкам.
+    Ключи (сначала short_codes, затем custom_aliases) разбиваются на страницы по limit штук.
+    """
+    short_codes: list[str] = Field(default_factory=list, description="Короткие коды ссылок")
+    custom_aliases: list[str] = Field(default_factory=list, description="Кастомные alias")
+    offset: int = Field(0, ge=0, description="Смещение страницы в списке ключей")
+    limit: int = Field(500, ge=1, le=BULK_STATS_MAX_PAGE, description="Количество ключей на странице")
+
+
+class BulkLinkStats(LinkStatsResponse):
+    """
+    Схема статистики по ссылке в ответе на массовый запрос.
+    """
+    short_code: str = Field(..., description="Короткий код ссылки")
+    custom_alias: Optional[str] = Field(None, description="Кастомный alias")
+
+
+class BulkStatsResponse(BaseModel):
+    """
+    Схема ответа на массовый запрос статистики.
+    """
+    items: list[BulkLinkStats] = Field(default_factory=list, description="Найденные ссылки")
+    missing_short_codes: list[str] = Field(default_factory=list, description="Коды, для которых ссылка не найдена")
+    missing_custom_aliases: list[str] = Field(default_factory=list, description="Alias, для которых ссылка не найдена")
+    total: int = Field(..., description="Общее количество ключей в запросе")
+    next_offset: Optional[int] = Field(None, description="Смещение следующей страницы или null")
+
+
+class ClickBucket(BaseModel):
+    """
+    Схема количества переходов за один интервал времени.
+    """
+    bucket_start: datetime = Field(..., description="Начало интервала")
+    clicks: int = Field(..., description="Количество переходов")
+
+
+class DimensionCount(BaseModel):
+    """
+    Схема количества переходов для одного значения User-Agent или referrer.
+    """
+    value: str = Field(..., description="Значение")
+    clicks: int = Field(..., description="Количество переходов")
+
+
+class LinkTimeseriesResponse(BaseModel):
+    """
+    Схема временного ряда переходов по ссылке.
+    """
+    short_code: str = Field(..., description="Короткий код ссылки")
+    granularity: str = Field(..., description="Детализация: minute, hour или day")
+    start: datetime = Field(..., description="Начало периода")
+    end: datetime = Field(..., description="Конец периода")
+    buckets: list[ClickBucket] = Field(default_factory=list, description="Интервалы с переходами")
+    top_user_agents: list[DimensionCount] = Field(default_factory=list, description="Частые User-Agent")
+    top_referrers: list[DimensionCount] = Field(default_factory=list, description="Частые referrer")
+
+
+class UserLinksResponse(BaseModel):
+    """
+    Схема страницы списка ссылок пользователя.
+    """
+    items: list[LinkResponse] = Field(default_factory=list, description="Ссылки")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы или null")
@@ -0,0 +1,88 @@
+"""
+Бенчмарк обработчика редиректов: FastRedirectMiddleware против маршрута FastAPI redirect_to_original_url.
+
+Каждый режим запускается в отдельном процессе (FAST_REDIRECT_ENABLED=1 и 0) поверх SQLite.
+Ссылки прогреваются в кэше, после чего замеряется процессорное время и задержка на один
+редирект, так что сравнивается именно накладной расход обработчика, а не БД.
+
+Запуск из корня репозитория (зависимости - benchmarks/requirements.txt):
+    python benchmarks/bench_redirect.py --links 1000 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def measure(links: int, requests: int) -> dict:
+    import httpx
+
+    from auth.database import create_db_and_tables, engine
+    from main import app
+
+    await create_db_and_tables()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            resp = await client.post("/links/shorten/batch",
+                                     json=[{"original_url": f"https://example.com/{i}"} for i in range(links)])
+            codes = [item["short_code"] for item in resp.json()]
+            for code in codes:
+                await client.get(f"/links/{code}")
+
+            latencies = []
+            cpu_started = time.process_time()
+            wall_started = time.perf_counter()
+            for i in range(requests):
+                started = time.perf_counter()
+                resp = await client.get(f"/links/{codes[i % links]}")
+                latencies.append(time.perf_counter() - started)
+                assert resp.status_code == 302, resp.status_code
+            cpu = time.process_time() - cpu_started
+            wall = time.perf_counter() - wall_started
+    await engine.dispose()
+    latencies.sort()
+    return {
+        "cpu_us_per_request": round(cpu / requests * 1e6, 1),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "rps": round(requests / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.links, args.requests))))
+        return
+
+    results = {}
+    for mode, enabled in (("fastapi_route", "0"), ("fast_path", "1")):
+        with tempfile.TemporaryDirectory() as tmp:
+            # логи каждого запроса httpx добавляли бы одинаковые накладные расходы обоим режимам
+            env = dict(os.environ, FAST_REDIRECT_ENABLED=enabled, CLICK_EVENTS_ENABLED="0", RATE_LIMIT_ENABLED="0",
+                       LOG_LEVEL="WARNING",
+                       DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+            out = subprocess.check_output(
+                [sys.executable, __file__, "--child", "--links", str(args.links), "--requests", str(args.requests)],
+                env=env, text=True)
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    base = results["fastapi_route"]["cpu_us_per_request"]
+    fast = results["fast_path"]["cpu_us_per_request"]
+    results["cpu_reduction_percent"] = round((base - fast) / base * 100, 1) if base else 0.0
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Бенчмарк: сколько раз соединение берется из пула (checkout) на один HTTP-запрос.
+
+Приложение запускается в процессе через httpx.ASGITransport поверх SQLite (aiosqlite),
+так что Postgres не нужен. Зависимости - benchmarks/requirements.txt.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_sessions.py --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(requests: int) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from auth.database import create_db_and_tables, engine
+    from main import app
+
+    await create_db_and_tables()
+
+    checkouts = 0
+
+    def on_checkout(*args):
+        nonlocal checkouts
+        checkouts += 1
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+
+    urls = [f"https://example.com/page/{i}" for i in range(requests)]
+    codes = []
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def create(i):
+            resp = await client.post("/links/shorten", json={"original_url": urls[i]})
+            codes.append(resp.json()["short_code"])
+
+        scenarios = [
+            ("create", create),
+            ("stats", lambda i: client.get(f"/links/{codes[i]}/stats")),
+            ("search", lambda i: client.get("/links/search", params={"original_url": urls[i]})),
+            ("redirect", lambda i: client.get(f"/links/{codes[i]}")),
+        ]
+        for name, call in scenarios:
+            checkouts = 0
+            for i in range(requests):
+                await call(i)
+            results[name] = checkouts / requests
+
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="число запросов на сценарий")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        results = asyncio.run(run(args.requests))
+
+    print(json.dumps({"checkouts_per_request": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк холодного старта: время от запуска процесса uvicorn до готовности (/health/ready = 200)
+и до первого успешного редиректа.
+
+База - SQLite-файл с заранее созданными ссылками, приложение запускается отдельным процессом,
+как под оркестратором. Зависимости - benchmarks/requirements.txt.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_startup.py --links 10000 --runs 5
+    STARTUP_POOL_WARM=5 STARTUP_CACHE_WARM=1000 python benchmarks/bench_startup.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def seed(links: int) -> str:
+    from sqlalchemy import insert
+
+    from auth.database import create_db_and_tables, engine, get_url_hash
+    from models.models import Link
+
+    await create_db_and_tables()
+    async with engine.begin() as conn:
+        await conn.execute(insert(Link), [{
+            "original_url": f"https://example.com/{i}",
+            "original_url_hash": get_url_hash(f"https://example.com/{i}"),
+            "short_code": f"code{i}",
+            "access_count": links - i,
+        } for i in range(links)])
+    await engine.dispose()
+    return "code0"
+
+
+async def measure(port: int, env: dict, code: str, timeout: float = 60) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env)
+    result = {}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    resp = await client.get("/health/ready")
+                except httpx.TransportError:
+                    resp = None
+                if resp is not None and resp.status_code == 200:
+                    result["ready_seconds"] = time.perf_counter() - started
+                    result["server"] = resp.json()
+                    break
+                await asyncio.sleep(0.01)
+            resp = await client.get(f"/links/{code}")
+            result["first_redirect_seconds"] = time.perf_counter() - started
+            result["first_redirect_status"] = resp.status_code
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        os.environ.update(env)
+        code = asyncio.run(seed(args.links))
+        runs = [asyncio.run(measure(args.port, env, code)) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "ready_p50_seconds": round(statistics.median(run["ready_seconds"] for run in runs), 3),
+        "first_redirect_p50_seconds": round(statistics.median(run["first_redirect_seconds"] for run in runs), 3),
+        "runs": runs,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Сравнение двух результатов benchmarks/load.py.
+
+Запуск:
+    python benchmarks/compare.py base.json new.json [--threshold 10]
+
+Выводит изменение rps и p50/p95/p99 по каждому сценарию и операции. Код возврата 1, если
+rps упал или p95 вырос больше чем на --threshold процентов.
+"""
+import argparse
+import json
+import sys
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимое ухудшение, %%")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base: {base.get('commit')}  new: {new.get('commit')}")
+    regressions = []
+    for name, new_result in new["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            continue
+        rps_change = change(base_result["rps"], new_result["rps"])
+        print(f"\n{name}: rps {base_result['rps']} -> {new_result['rps']} ({rps_change:+.1f}%)")
+        if rps_change < -args.threshold:
+            regressions.append(f"{name} rps")
+        for operation, stats in new_result["operations"].items():
+            base_stats = base_result["operations"].get(operation)
+            if base_stats is None:
+                continue
+            line = "  ".join(
+                f"{key} {base_stats[key]} -> {stats[key]} ({change(base_stats[key], stats[key]):+.1f}%)"
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+            )
+            print(f"  {operation:9} {line}")
+            if change(base_stats["p95_ms"], stats["p95_ms"]) > args.threshold:
+                regressions.append(f"{name}/{operation} p95")
+
+    if regressions:
+        print("\nregressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Нагрузочный бенчмарк API ссылок: shorten_link, redirect_to_original_url и get_link_stats.
+
+Приложение запускается в процессе (httpx.ASGITransport) вместе с lifespan, база - временный
+файл SQLite (aiosqlite) или любая БД из --database-url. Перед замерами создается --links ссылок,
+популярность которых распределена по закону Ципфа. Для каждого сценария считаются p50/p95/p99
+задержки и число запросов в секунду, результат пишется в JSON (--output), который можно
+сравнить с результатом другого коммита через benchmarks/compare.py.
+
+Запуск из корня репозитория (зависимости - benchmarks/requirements.txt):
+    python benchmarks/load.py --links 10000 --requests 20000 --concurrency 64 --output bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Доли запросов каждого типа в сценариях
+WORKLOADS = {
+    "redirect-heavy": {"redirect": 0.95, "stats": 0.05},
+    "create-heavy": {"create": 0.9, "redirect": 0.1},
+    "mixed": {"redirect": 0.7, "stats": 0.1, "search": 0.05, "create": 0.15},
+}
+
+
+class ZipfSampler:
+    """
+    Выбор индекса ссылки с вероятностью, пропорциональной 1 / rank^s.
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.population = range(n)
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+    def sample(self) -> int:
+        return self.rng.choices(self.population, cum_weights=self.cum_weights)[0]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: dict[str, list[float]], elapsed: float, errors: int) -> dict:
+    total = sum(len(values) for values in latencies.values())
+    result = {"requests": total, "errors": errors, "seconds": round(elapsed, 3),
+              "rps": round(total / elapsed, 1) if elapsed else 0.0, "operations": {}}
+    for operation, values in latencies.items():
+        values.sort()
+        result["operations"][operation] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        # коммит репозитория с бенчмарком, а не текущего каталога
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def seed(client, links: int, chunk: int = 1000) -> tuple[list[str], list[str]]:
+    urls = [f"https://example.com/seed/{i}" for i in range(links)]
+    codes = []
+    for start in range(0, links, chunk):
+        resp = await client.post("/links/shorten/batch",
+                                 json=[{"original_url": url} for url in urls[start:start + chunk]])
+        resp.raise_for_status()
+        codes.extend(item["short_code"] for item in resp.json())
+    return urls, codes
+
+
+async def run_workload(client, name: str, mix: dict, args, urls: list[str], codes: list[str],
+                       sampler: ZipfSampler, rng: random.Random) -> dict:
+    operations = list(mix)
+    weights = list(mix.values())
+    created = itertools.count()
+    latencies = {operation: [] for operation in operations}
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(rng.choices(operations, weights)[0])
+
+    async def call(operation: str):
+        if operation == "redirect":
+            return await client.get(f"/links/{codes[sampler.sample()]}")
+        if operation == "stats":
+            return await client.get(f"/links/{codes[sampler.sample()]}/stats")
+        if operation == "search":
+            return await client.get("/links/search", params={"original_url": urls[sampler.sample()]})
+        return await client.post("/links/shorten", json={"original_url": f"https://example.com/{name}/{next(created)}"})
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            operation = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                resp = await call(operation)
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies[operation].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from auth.database import create_db_and_tables, engine
+    from main import app
+
+    await create_db_and_tables()
+    rng = random.Random(args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            urls, codes = await seed(client, args.links)
+            sampler = ZipfSampler(len(codes), args.zipf_s, rng)
+            for name in args.workloads:
+                results[name] = await run_workload(client, name, WORKLOADS[name], args, urls, codes, sampler, rng)
+                print(f"{name}: {results[name]['rps']} rps", file=sys.stderr)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10000, help="сколько ссылок создать перед замерами")
+    parser.add_argument("--requests", type=int, default=20000, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных клиентов")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="параметр s распределения Ципфа")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="БД для замеров, по умолчанию временный файл SQLite")
+    parser.add_argument("--output", default="bench_results.json", help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        # вся нагрузка идет от одного клиента, ограничение частоты ее бы отсекло
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        results = asyncio.run(run(args))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "database_url")},
+        "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
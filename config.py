@@ -10,4 +10,124 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Пул соединений с БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_PRE_PING = _get_bool("DB_POOL_PRE_PING", True)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))                  # сек, -1 - не пересоздавать
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))   # кэш prepared statements asyncpg
+
+# Реплики для чтения: DSN через запятую, пусто - все запросы идут в DATABASE_URL
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", 5))    # период проверки реплик, сек
+REPLICA_HEALTH_TIMEOUT = float(os.getenv("REPLICA_HEALTH_TIMEOUT", 1))      # таймаут проверки, сек
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))                    # реплика с большим отставанием не читается, сек
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", 5))    # измененные ключи читаются из primary, сек
+
+# Кэш редиректов short_code -> original_url
+LINK_CACHE_SIZE = int(os.getenv("LINK_CACHE_SIZE", 10000))    # максимальное число записей (LRU)
+LINK_CACHE_TTL = float(os.getenv("LINK_CACHE_TTL", 60))       # время жизни записи в секундах
+
+# Буферизация счетчика переходов (write-behind)
+CLICK_MAX_STALENESS = float(os.getenv("CLICK_MAX_STALENESS", 2))        # максимальная задержка записи в БД, сек
+CLICK_FLUSH_THRESHOLD = int(os.getenv("CLICK_FLUSH_THRESHOLD", 1000))   # число ссылок в буфере для досрочного сброса
+
+# Массовое сокращение ссылок
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))                  # ссылок в одном многострочном INSERT
+BULK_SPOOL_SIZE = int(os.getenv("BULK_SPOOL_SIZE", 1024 * 1024))           # результаты больше этого размера пишутся на диск
+BULK_STATS_MAX_PAGE = int(os.getenv("BULK_STATS_MAX_PAGE", 1000))          # максимум ключей на страницу массовой статистики
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))                # строк, читаемых экспортом за одну транзакцию
+
+# Генерация коротких кодов
+SHORT_CODE_STRATEGY = os.getenv("SHORT_CODE_STRATEGY", "hash")            # hash, counter или pool
+SHORT_CODE_LENGTH = int(os.getenv("SHORT_CODE_LENGTH", 10))               # длина кода (для counter - минимальная)
+SHORT_CODE_MAX_ATTEMPTS = int(os.getenv("SHORT_CODE_MAX_ATTEMPTS", 5))    # попыток при коллизии кода
+CODE_BLOCK_SIZE = int(os.getenv("CODE_BLOCK_SIZE", 1000))                 # номеров, резервируемых воркером за раз (counter)
+CODE_POOL_SIZE = int(os.getenv("CODE_POOL_SIZE", 10000))                  # размер пула заранее сгенерированных кодов (pool)
+
+# Очистка протухших ссылок
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", 100))            # пауза между проходами, сек
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", 1000))         # строк, удаляемых одной транзакцией
+REAPER_BATCH_PAUSE = float(os.getenv("REAPER_BATCH_PAUSE", 0.1))      # пауза между пачками, сек
+REAPER_LOCK_ID = int(os.getenv("REAPER_LOCK_ID", 7318001))            # ключ advisory lock в Postgres
+
+# Секции link_stats по месяцам accessed_at (Postgres, миграция 0009); старые секции удаляются целиком
+LINK_STATS_RETENTION_MONTHS = int(os.getenv("LINK_STATS_RETENTION_MONTHS", 12))  # месяцев сырых переходов (0 - хранить все)
+LINK_STATS_PARTITIONS_AHEAD = int(os.getenv("LINK_STATS_PARTITIONS_AHEAD", 3))   # секций, создаваемых заранее
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Прогрев воркера при запуске (до готовности в /health/ready)
+STARTUP_POOL_WARM = int(os.getenv("STARTUP_POOL_WARM", 0))     # соединений с БД, открываемых заранее (0 - не открывать)
+STARTUP_CACHE_WARM = int(os.getenv("STARTUP_CACHE_WARM", 0))   # самых посещаемых ссылок в кэш редиректов (0 - не загружать)
+
+# Кэш токен -> пользователь для эндпоинтов ссылок
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))    # максимум токенов в кэше
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 30))       # время жизни записи, сек (не дольше срока токена)
+
+# Общий кэш для нескольких воркеров/узлов: пусто - выключен, memory:// - в памяти процесса, redis://host:port/db
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", 300))               # время жизни ссылки в кэше, сек
+SHARED_CACHE_STATS_TTL = float(os.getenv("SHARED_CACHE_STATS_TTL", 5))     # время жизни статистики в кэше, сек
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", 0.05))      # таймаут операций с кэшем, сек
+SHARED_CACHE_RETRY_AFTER = float(os.getenv("SHARED_CACHE_RETRY_AFTER", 5)) # после ошибки кэш не используется столько сек
+
+# События переходов (таблица link_stats)
+CLICK_EVENTS_ENABLED = _get_bool("CLICK_EVENTS_ENABLED", True)
+CLICK_EVENTS_QUEUE_SIZE = int(os.getenv("CLICK_EVENTS_QUEUE_SIZE", 10000))         # максимум событий в очереди
+CLICK_EVENTS_BATCH_SIZE = int(os.getenv("CLICK_EVENTS_BATCH_SIZE", 500))           # событий в одной записи в БД
+CLICK_EVENTS_FLUSH_INTERVAL = float(os.getenv("CLICK_EVENTS_FLUSH_INTERVAL", 1))   # ожидание неполной пачки, сек
+CLICK_EVENTS_OVERLOAD_POLICY = os.getenv("CLICK_EVENTS_OVERLOAD_POLICY", "drop")   # drop, sample или block
+CLICK_EVENTS_SAMPLE_RATE = float(os.getenv("CLICK_EVENTS_SAMPLE_RATE", 0.1))       # доля событий при sample
+
+# Временные ряды переходов
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", 2000))   # максимум интервалов в одном ответе
+TIMESERIES_TOP_LIMIT = int(os.getenv("TIMESERIES_TOP_LIMIT", 10))         # размер топа User-Agent/referrer по умолчанию
+
+# Быстрый обработчик редиректов на уровне ASGI (без FastAPI DI, ORM и Pydantic)
+FAST_REDIRECT_ENABLED = _get_bool("FAST_REDIRECT_ENABLED", True)
+
+# Отсев запросов к несуществующим коротким кодам (Bloom-фильтр и негативный кэш)
+BLOOM_ENABLED = _get_bool("BLOOM_ENABLED", True)
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_ERROR_RATE", 0.001))             # доля ложноположительных ответов
+BLOOM_MIN_CAPACITY = int(os.getenv("BLOOM_MIN_CAPACITY", 100000))          # минимальная емкость фильтра, ключей
+BLOOM_REFRESH_INTERVAL = float(os.getenv("BLOOM_REFRESH_INTERVAL", 1))     # подгрузка новых ссылок других воркеров, сек
+BLOOM_REBUILD_INTERVAL = float(os.getenv("BLOOM_REBUILD_INTERVAL", 3600))  # полная перестройка (убирает удаленные), сек
+BLOOM_REBUILD_BATCH = int(os.getenv("BLOOM_REBUILD_BATCH", 10000))         # строк, читаемых за один запрос
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", 100000))        # максимум запомненных несуществующих кодов
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", 5))             # время жизни записи, сек
+
+# Кэширование редиректов браузерами и CDN (Cache-Control), не дольше expires_at ссылки
+REDIRECT_PERMANENT_MAX_AGE = int(os.getenv("REDIRECT_PERMANENT_MAX_AGE", 86400))   # max-age для 301, сек
+REDIRECT_TEMPORARY_MAX_AGE = int(os.getenv("REDIRECT_TEMPORARY_MAX_AGE", 0))       # max-age для 302, сек (0 - не кэшировать)
+
+# Ограничение частоты запросов (token bucket): rate - запросов в секунду, burst - допустимый всплеск; rate=0 - без ограничения
+# Анонимный клиент определяется по IP. За балансировщиком или прокси у всех запросов один адрес прокси,
+# поэтому ограничение выключено по умолчанию: перед включением укажите адреса прокси в RATE_LIMIT_TRUSTED_PROXIES,
+# тогда адрес клиента берется из X-Forwarded-For
+RATE_LIMIT_ENABLED = _get_bool("RATE_LIMIT_ENABLED", False)
+RATE_LIMIT_TRUSTED_PROXIES = [                                                   # IP или подсети (CIDR) через запятую
+    net.strip() for net in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if net.strip()
+]
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "")                                 # пусто - в памяти воркера, redis://... - общий
+RATE_LIMIT_SHORTEN_RATE = float(os.getenv("RATE_LIMIT_SHORTEN_RATE", 5))         # создание ссылок, на клиента
+RATE_LIMIT_SHORTEN_BURST = int(os.getenv("RATE_LIMIT_SHORTEN_BURST", 20))
+RATE_LIMIT_REDIRECT_RATE = float(os.getenv("RATE_LIMIT_REDIRECT_RATE", 50))      # редиректы, на клиента
+RATE_LIMIT_REDIRECT_BURST = int(os.getenv("RATE_LIMIT_REDIRECT_BURST", 100))
+RATE_LIMIT_LINK_RATE = float(os.getenv("RATE_LIMIT_LINK_RATE", 0))               # редиректы, на одну ссылку
+RATE_LIMIT_LINK_BURST = int(os.getenv("RATE_LIMIT_LINK_BURST", 1000))
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", 100000))        # максимум корзин в памяти на правило
+
+# Закрепленный набор самых посещаемых ссылок (по access_count), который редирект проверяет первым
+HOT_LINKS_SIZE = int(os.getenv("HOT_LINKS_SIZE", 1000))                        # ссылок в наборе (0 - отключен)
+HOT_LINKS_REFRESH_INTERVAL = float(os.getenv("HOT_LINKS_REFRESH_INTERVAL", 60))  # пересчет набора, сек
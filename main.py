@@ -1,16 +1,119 @@
 import asyncio
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import RedirectResponse
+import base64
+import binascii
+import json
+import logging
+import tempfile
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
-from auth.database import User, create_db_and_tables, get_async_session, LinkManager
-from auth.auth import register_router, users_router, auth_backend, fastapi_users  # Импортируем fastapi_users
-from auth.schemas import LinkCreate, LinkResponse, LinkStatsResponse, LinkSearch
+from auth.database import User, get_async_session, LinkManager
+from auth.auth import register_router, users_router, auth_backend, fastapi_users, link_authenticator
+from auth.schemas import (
+    LinkCreate, LinkResponse, LinkStatsResponse, LinkSearch, BulkLinkResult, BulkStatsRequest, BulkLinkStats,
+    BulkStatsResponse, ClickBucket, DimensionCount, LinkTimeseriesResponse, UserLinksResponse,
+)
 from datetime import datetime
-from auth.database import deleteExpiredLinks
+from auth.database import (
+    deleteExpiredLinks, code_generator, hot_links, link_filter, load_hot_links, pool_stats, reaper_stats, replica_router,
+    warm_pool,
+)
+from auth.metrics import MetricsMiddleware, StatsCollector, render_metrics, startup_timings
+from prometheus_client import REGISTRY
+from dataclasses import asdict
+from auth.cache import link_cache, negative_cache, shared_cache, user_token_cache
+from auth.clicks import click_buffer, click_events
+from auth.analytics import GRANULARITIES, get_click_timeseries, get_top_dimension
+from auth.export import EXPORT_STATUSES, export_csv, export_ndjson, iter_link_pages
+from auth.http_cache import conditional_response, redirect_cache_policy
+from auth.redirect import FastRedirectMiddleware, LINK_EXPIRED, LINK_NOT_FOUND, record_click, resolve_link
+from auth.ratelimit import RateLimitMiddleware, default_rules, rate_limiter
+from config import (
+    BULK_CHUNK_SIZE, BULK_SPOOL_SIZE, EXPORT_PAGE_SIZE, LOG_LEVEL, TIMESERIES_MAX_BUCKETS, TIMESERIES_TOP_LIMIT,
+    FAST_REDIRECT_ENABLED, STARTUP_POOL_WARM, STARTUP_CACHE_WARM, RATE_LIMIT_ENABLED,
+)
 import uvicorn
 
-app = FastAPI()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+
+async def warm_up():
+    """
+    Прогрев воркера: соединения с БД и самые посещаемые ссылки в кэше редиректов.
+    Пока он идет, /health/ready отвечает 503 и балансировщик не направляет сюда трафик.
+    Ошибка прогрева не мешает работе: воркер просто начинает с холодными пулом и кэшем.
+    """
+    try:
+        if STARTUP_POOL_WARM:
+            with startup_timings.phase("pool_warm"):
+                await warm_pool(STARTUP_POOL_WARM)
+        if STARTUP_CACHE_WARM:
+            with startup_timings.phase("cache_warm"):
+                loaded = await load_hot_links(STARTUP_CACHE_WARM)
+            logger.info("Redirect cache warmed with %d links", loaded)
+    except Exception:
+        logger.exception("Warm-up failed, starting cold")
+    startup_timings.mark_ready()
+    logger.info("Worker ready in %.3f s, phases: %s", startup_timings.ready_after,
+                {name: round(seconds, 3) for name, seconds in startup_timings.phases.items()})
+    hot_links.start()
+    # Bloom-фильтр читает всю таблицу ссылок, поэтому строится уже после прогрева
+    link_filter.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка приложения. Схема БД здесь не создается: перед запуском применяются
+    миграции (alembic upgrade head). Фоновые задачи стартуют сразу, прогрев идет в фоне.
+    """
+    # показатели компонентов, которые отдаются в /metrics
+    stats_collector = StatsCollector(
+        {
+            "hot_links": hot_links.stats,
+            "link_cache": link_cache.stats,
+            "shared_cache": shared_cache.stats,
+            "negative_cache": negative_cache.stats,
+            "auth_cache": user_token_cache.stats,
+            "link_filter": link_filter.stats,
+            "click_events": click_events.stats,
+            "db_pool": pool_stats,
+            "replicas": replica_router.stats,
+            "reaper": lambda: asdict(reaper_stats),
+            "startup": startup_timings.stats,
+            "rate_limit": rate_limiter.stats,
+        },
+        counters=("hits", "misses", "evictions", "errors", "written", "dropped", "runs", "total_purged",
+                  "total_partitions_dropped", "checks", "rejected", "rebuilds",
+                  "primary_reads", "replica_reads", "fallbacks", "allowed", "limited"),
+    )
+    REGISTRY.register(stats_collector)
+    reaper_task = asyncio.create_task(deleteExpiredLinks())
+    click_buffer.start()
+    click_events.start()
+    code_generator.start()
+    replica_router.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    reaper_task.cancel()
+    await replica_router.stop()
+    await link_filter.stop()
+    await hot_links.stop()
+    await code_generator.stop()
+    # при остановке записываем в БД накопленные переходы и события
+    await click_buffer.stop()
+    await click_events.stop()
+    await shared_cache.close()
+    await rate_limiter.close()
+    REGISTRY.unregister(stats_collector)
+
+app = FastAPI(lifespan=lifespan)
 
 # Маршруты для аутентификации
 app.include_router(
@@ -25,40 +128,29 @@ app.include_router(register_router, prefix="/auth", tags=["auth"])
 # Маршруты для управления пользователями
 app.include_router(users_router, prefix="/users", tags=["users"])
 
-# Защищенные эндпоинты (только для авторизованных пользователей)
-current_active_user = fastapi_users.current_user(active=True)
-
-
-@app.on_event("startup")
-async def on_startup():
-    """
-    Создание таблиц в базе данных при запуске приложения.
-    """
-    await create_db_and_tables()
+# Защищенные эндпоинты (только для авторизованных пользователей); проверенные токены кэшируются
+current_active_user = link_authenticator.current_user(active=True)
+# Для создания ссылок авторизация не обязательна: ссылки анонимных пользователей создаются без владельца
+optional_active_user = link_authenticator.current_user(active=True, optional=True)
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    asyncio.create_task(deleteExpiredLinks())
-    yield
-
-app = FastAPI(lifespan=lifespan)
 
 @app.post("/links/shorten", response_model=LinkResponse, tags=["links"])
 async def shorten_link(
     link_data: LinkCreate,
     session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
-    # user=Depends(current_active_user),
+    user: Optional[User] = Depends(optional_active_user),
 ):
     """
-    Создает короткую ссылку.
+    Создает короткую ссылку. Если пользователь авторизован, он становится владельцем ссылки.
     """
     link_manager = LinkManager(session)
     expires_at = link_data.expires_at or None
     link = await link_manager.create_link(
         original_url=link_data.original_url,
         custom_alias=link_data.custom_alias,
-        # user_id=id,
+        user_id=user.id if user else None,
         expires_at=expires_at,
+        permanent=link_data.permanent,
     )
 
     if isinstance(link, str):
@@ -70,69 +162,414 @@ async def shorten_link(
         created_at=link.created_at,
         expires_at=link.expires_at,
         access_count=link.access_count,
+        permanent=bool(link.is_permanent),
     )
 
 
+# Описание ошибок массового сокращения по статусу
+BULK_ERRORS = {
+    "alias_conflict": "custom_alias already exist",
+    "code_conflict": "could not generate unique short code",
+}
+
+
+async def _shorten_chunk(link_manager: LinkManager, items: list, start: int,
+                         user_id: Optional[int] = None) -> list[BulkLinkResult]:
+    """
+    Сокращает одну пачку ссылок. Элементы items - LinkCreate либо текст ошибки валидации.
+    """
+    valid = [item for item in items if isinstance(item, LinkCreate)]
+    statuses = iter(await link_manager.create_links(valid, user_id))
+    results = []
+    for index, item in enumerate(items, start):
+        if not isinstance(item, LinkCreate):
+            results.append(BulkLinkResult(index=index, status="invalid", detail=item))
+            continue
+        status, short_code = next(statuses)
+        results.append(BulkLinkResult(
+            index=index,
+            status=status,
+            original_url=item.original_url,
+            short_code=short_code,
+            custom_alias=item.custom_alias,
+            detail=BULK_ERRORS.get(status),
+        ))
+    return results
+
+
+@app.post("/links/shorten/batch", response_model=list[BulkLinkResult], tags=["links"])
+async def shorten_links_batch(
+    links_data: list[LinkCreate],
+    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+    user: Optional[User] = Depends(optional_active_user),
+):
+    """
+    Создает много коротких ссылок за один запрос. Результаты возвращаются в порядке входного списка.
+    """
+    link_manager = LinkManager(session)
+    results = []
+    for start in range(0, len(links_data), BULK_CHUNK_SIZE):
+        results.extend(await _shorten_chunk(link_manager, links_data[start:start + BULK_CHUNK_SIZE], start,
+                                            user.id if user else None))
+    return results
+
+
+async def _read_ndjson_chunks(request: Request, size: int):
+    """
+    Читает тело запроса в формате NDJSON по мере поступления и отдает пачки не больше size строк.
+    """
+    tail = b""
+    chunk = []
+    async for data in request.stream():
+        *lines, tail = (tail + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if tail.strip():
+        chunk.append(tail)
+    if chunk:
+        yield chunk
+
+
+@app.post("/links/shorten/stream", tags=["links"])
+async def shorten_links_stream(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+    user: Optional[User] = Depends(optional_active_user),
+):
+    """
+    Массовое сокращение ссылок в потоковом режиме: на входе NDJSON (по одному LinkCreate в строке),
+    на выходе NDJSON с BulkLinkResult в том же порядке. Вход обрабатывается пачками, поэтому
+    расход памяти не зависит от размера загрузки.
+    """
+    link_manager = LinkManager(session)
+    # результаты копятся во временном файле, который уходит на диск, если становится большим
+    output = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_SIZE)
+    index = 0
+    async for lines in _read_ndjson_chunks(request, BULK_CHUNK_SIZE):
+        items = []
+        for line in lines:
+            try:
+                items.append(LinkCreate.model_validate_json(line))
+            except ValidationError as e:
+                items.append(str(e))
+        for result in await _shorten_chunk(link_manager, items, index, user.id if user else None):
+            output.write(result.model_dump_json().encode() + b"\n")
+        index += len(lines)
+    output.seek(0)
+    return StreamingResponse(output, media_type="application/x-ndjson", background=BackgroundTask(output.close))
+
+
+@app.post("/links/stats/batch", response_model=BulkStatsResponse, tags=["links"])
+async def get_links_stats_batch(
+    request_data: BulkStatsRequest,
+    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+):
+    """
+    Возвращает статистику сразу по многим ссылкам одним запросом к БД.
+    Ключи, для которых ссылка не найдена, перечисляются в missing_short_codes / missing_custom_aliases.
+    """
+    # уникальные ключи в порядке запроса, сначала коды, затем alias
+    keys = [("code", code) for code in dict.fromkeys(request_data.short_codes)]
+    keys += [("alias", alias) for alias in dict.fromkeys(request_data.custom_aliases)]
+    page = keys[request_data.offset:request_data.offset + request_data.limit]
+    codes = [key for kind, key in page if kind == "code"]
+    aliases = [key for kind, key in page if kind == "alias"]
+
+    link_manager = LinkManager(session)
+    links = await link_manager.get_links_by_keys(codes, aliases)
+    by_code = {link.short_code: link for link in links}
+    by_alias = {link.custom_alias: link for link in links if link.custom_alias}
+
+    response = BulkStatsResponse(total=len(keys))
+    for kind, key in page:
+        link = by_code.get(key) if kind == "code" else by_alias.get(key)
+        if link is None:
+            missing = response.missing_short_codes if kind == "code" else response.missing_custom_aliases
+            missing.append(key)
+            continue
+        pending_count, pending_accessed_at = click_buffer.pending(link.short_code)
+        response.items.append(BulkLinkStats(
+            short_code=link.short_code,
+            custom_alias=link.custom_alias,
+            original_url=link.original_url,
+            created_at=link.created_at,
+            expires_at=link.expires_at,
+            access_count=(link.access_count or 0) + pending_count,
+            last_accessed_at=pending_accessed_at or link.last_accessed_at,
+        ))
+    if request_data.offset + request_data.limit < len(keys):
+        response.next_offset = request_data.offset + request_data.limit
+    return response
+
+
+def _latest(*moments) -> Optional[datetime]:
+    """
+    Самая поздняя из дат (значения из общего кэша приходят строками ISO 8601), без часового пояса.
+    """
+    moments = [datetime.fromisoformat(moment) if isinstance(moment, str) else moment for moment in moments if moment]
+    return max(moment.replace(tzinfo=None) for moment in moments) if moments else None
+
+
 @app.get("/links/search", response_model=LinkSearch, tags=["links"])
 async def get_link_stats(
     original_url: str,
+    request: Request,
     session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
 ):
+    """
+    Ищет короткую ссылку по оригинальному URL. Поддерживает условные запросы (ETag / Last-Modified).
+    """
     link_manager = LinkManager(session)
     link = await link_manager.get_link_by_original_url(original_url)
     if not link:
         raise HTTPException(status_code=404, detail="Ссылка не найдена")
-    return LinkSearch(
+    return conditional_response(request, LinkSearch(
         original_url=link.original_url,
         short_code=link.short_code,
         custom_alias=link.custom_alias,
         created_at=link.created_at,
         expires_at=link.expires_at,
+    ), last_modified=_latest(link.created_at, link.updated_at))
+
+
+@app.get("/links/export", tags=["links"])
+async def export_links(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status: str = Query("all", pattern=f"^({'|'.join(EXPORT_STATUSES)})$"),
+    after_id: int = Query(0, ge=0),
+    page_size: int = Query(EXPORT_PAGE_SIZE, ge=1, le=10000),
+    user: User = Depends(current_active_user),
+):
+    """
+    Потоковая выгрузка ссылок со статистикой в NDJSON или CSV в порядке возрастания id.
+    Прерванную выгрузку можно продолжить, передав в after_id последний полученный id.
+    Пользователь выгружает только свои ссылки; суперпользователь - ссылки user_id или все, если он не задан.
+    """
+    if not user.is_superuser:
+        if user_id is not None and user_id != user.id:
+            raise HTTPException(status_code=403, detail="Недостаточно прав для выгрузки чужих ссылок")
+        user_id = user.id
+    pages = iter_link_pages(
+        user_id=user_id,
+        created_from=created_from.replace(tzinfo=None) if created_from else None,
+        created_to=created_to.replace(tzinfo=None) if created_to else None,
+        status=status,
+        after_id=after_id,
+        page_size=page_size,
     )
+    if format == "csv":
+        return StreamingResponse(export_csv(pages), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="links.csv"'})
+    return StreamingResponse(export_ndjson(pages), media_type="application/x-ndjson")
+
+
+def _encode_cursor(value, link_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, link_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        value, link_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "created_at":
+            value = datetime.fromisoformat(value)
+        return int(value) if sort == "access_count" else value, int(link_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+
+
+@app.get("/users/me/links", response_model=UserLinksResponse, tags=["users"])
+async def get_my_links(
+    sort: str = Query("created_at", pattern="^(created_at|access_count)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+    user: User = Depends(current_active_user),
+):
+    """
+    Возвращает ссылки текущего пользователя постранично, по дате создания или количеству переходов.
+    Следующая страница запрашивается с cursor из next_cursor предыдущего ответа.
+    """
+    link_manager = LinkManager(session)
+    after = _decode_cursor(cursor, sort) if cursor else None
+    links = await link_manager.get_user_links(user.id, sort, order == "desc", after, limit)
+    response = UserLinksResponse()
+    for link in links:
+        pending_count, _ = click_buffer.pending(link.short_code)
+        response.items.append(LinkResponse(
+            short_code=link.short_code,
+            original_url=link.original_url,
+            custom_alias=link.custom_alias,
+            created_at=link.created_at,
+            expires_at=link.expires_at,
+            access_count=(link.access_count or 0) + pending_count,
+            permanent=bool(link.is_permanent),
+        ))
+    if len(links) == limit:
+        # курсор строится по значениям из БД, по которым шла сортировка
+        response.next_cursor = _encode_cursor(getattr(links[-1], sort), links[-1].id)
+    return response
+
+
+@app.get("/metrics", tags=["service"], include_in_schema=False)
+async def get_metrics():
+    """
+    Метрики в формате Prometheus.
+    """
+    data, content_type = render_metrics()
+    return Response(content=data, media_type=content_type)
+
+
+@app.get("/health/live", tags=["service"])
+async def liveness():
+    """
+    Проба живости: процесс запущен и обрабатывает запросы.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["service"])
+async def readiness():
+    """
+    Проба готовности: 503, пока не закончен прогрев, затем 200. В ответе - время запуска по этапам.
+    """
+    stats = startup_timings.stats()
+    if not startup_timings.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **stats})
+    return {"status": "ready", **stats}
+
+
+@app.get("/cache/stats", tags=["service"])
+async def get_cache_stats():
+    """
+    Возвращает счетчики кэша редиректов воркера (попадания, промахи, вытеснения), закрепленного набора
+    самых посещаемых ссылок, общего кэша, негативного кэша и Bloom-фильтра коротких кодов.
+    """
+    return {
+        "hot": hot_links.stats(),
+        "local": link_cache.stats(),
+        "shared": shared_cache.stats(),
+        "negative": negative_cache.stats(),
+        "filter": link_filter.stats(),
+    }
 
 
 @app.get("/links/{short_code}", tags=["links"])
 async def redirect_to_original_url(
     short_code: str,
-    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+    request: Request,
 ):
     """
-    Перенаправляет на оригинальный URL по короткому коду.
+    Перенаправляет на оригинальный URL по короткому коду или custom_alias.
+    При FAST_REDIRECT_ENABLED запросы сюда не доходят: их обслуживает FastRedirectMiddleware с той же логикой.
     """
-    link_manager = LinkManager(session)
-    link = await link_manager.get_link_and_visit_by_short_code(short_code)
-    print(f"orig url = {link.original_url} ; short_code = {link.short_code}")
-    if not link:
-        raise HTTPException(status_code=404, detail="Ссылка не найдена")
-    if link.expires_at and link.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=410, detail="Срок действия ссылки истек")
-    link.increment_access_count()
-    await session.commit()
-    return RedirectResponse(url=link.original_url)
+    link = await resolve_link(short_code)
+    if link is None:
+        raise HTTPException(status_code=404, detail=LINK_NOT_FOUND)
+    # переход учитывается в буфере и попадет в БД при ближайшем сбросе
+    await record_click(
+        link,
+        request.client.host if request.client else None,
+        request.headers.get("user-agent"),
+        request.headers.get("referer"),
+    )
+    logger.debug("orig url = %s ; short_code = %s", link.original_url, link.short_code)
+    now = datetime.utcnow()
+    if link.is_expired(now):
+        raise HTTPException(status_code=410, detail=LINK_EXPIRED)
+    status, cache_control = redirect_cache_policy(link.permanent, link.expires_at, now)
+    return RedirectResponse(url=link.original_url, status_code=status, headers={"Cache-Control": cache_control})
 
 
 @app.get("/links/{short_code}/stats", response_model=LinkStatsResponse, tags=["links"])
 async def get_link_stats(
     short_code: str,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
+):
+    """
+    Возвращает статистику по ссылке. Поддерживает условные запросы (ETag / Last-Modified):
+    пока статистика не изменилась, повторный запрос получает 304 без тела.
+    """
+    stats = await shared_cache.get_stats(short_code)
+    if stats is None:
+        link_manager = LinkManager(session)
+        link = await link_manager.get_link_by_short_code(short_code)
+        if not link:
+            raise HTTPException(status_code=404, detail="Ссылка не найдена")
+        stats = {
+            "original_url": link.original_url,
+            "created_at": link.created_at,
+            "expires_at": link.expires_at,
+            "access_count": link.access_count or 0,
+            "last_accessed_at": link.last_accessed_at,
+            "updated_at": link.updated_at,
+        }
+        # статистику с реплики в общий кэш не пишем: она может отставать от primary
+        if not replica_router.last_read_from_replica():
+            await shared_cache.set_stats(short_code, stats)
+    # добавляем переходы, которые еще не успели записаться в БД
+    pending_count, pending_accessed_at = click_buffer.pending(short_code)
+    response = LinkStatsResponse(
+        original_url=stats["original_url"],
+        created_at=stats["created_at"],
+        expires_at=stats["expires_at"],
+        access_count=stats["access_count"] + pending_count,
+        last_accessed_at=pending_accessed_at or stats["last_accessed_at"],
+    )
+    return conditional_response(request, response, last_modified=_latest(
+        response.created_at, response.last_accessed_at, stats.get("updated_at")))
+
+
+
+@app.get("/links/{short_code}/stats/timeseries", response_model=LinkTimeseriesResponse, tags=["links"])
+async def get_link_timeseries(
+    short_code: str,
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    top: int = Query(TIMESERIES_TOP_LIMIT, ge=1, le=100),
     session: AsyncSession = Depends(get_async_session),  # Используем Depends для получения сессии
 ):
     """
-    Возвращает статистику по ссылке.
+    Возвращает количество переходов по ссылке по минутам, часам или дням за период [start, end)
+    и самые частые User-Agent и referrer. Данные берутся из предагрегированных таблиц.
     """
+    step, default_period = GRANULARITIES[granularity]
+    end = (end or datetime.utcnow()).replace(tzinfo=None)
+    start = (start or end - default_period).replace(tzinfo=None)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start должен быть раньше end")
+    if (end - start) / step > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Слишком большой период: больше {TIMESERIES_MAX_BUCKETS} интервалов")
+
     link_manager = LinkManager(session)
     link = await link_manager.get_link_by_short_code(short_code)
     if not link:
         raise HTTPException(status_code=404, detail="Ссылка не найдена")
-    return LinkStatsResponse(
-        original_url=link.original_url,
-        created_at=link.created_at,
-        expires_at=link.expires_at,
-        access_count=link.access_count,
-        last_accessed_at=link.last_accessed_at,
+    buckets = await get_click_timeseries(session, link.id, granularity, start, end)
+    user_agents = await get_top_dimension(session, link.id, "user_agent", start, end, top)
+    referrers = await get_top_dimension(session, link.id, "referrer", start, end, top)
+    return LinkTimeseriesResponse(
+        short_code=link.short_code,
+        granularity=granularity,
+        start=start,
+        end=end,
+        buckets=[ClickBucket(bucket_start=moment, clicks=clicks) for moment, clicks in buckets],
+        top_user_agents=[DimensionCount(value=value, clicks=clicks) for value, clicks in user_agents],
+        top_referrers=[DimensionCount(value=value, clicks=clicks) for value, clicks in referrers],
     )
 
 
-
 @app.delete("/links/delete_by_short_code/{short_code}", tags=["links"])
 async def delete_link_by_short_code(
     short_code: str,
@@ -184,7 +621,23 @@ async def update_link(
         created_at=link.created_at,
         expires_at=link.expires_at,
         access_count=link.access_count,
+        permanent=bool(link.is_permanent),
     )
 
+# Middleware подключаются после объявления всех маршрутов; добавленное последним становится внешним слоем
+# статические маршруты /links/<имя>, которые не являются короткими кодами
+# (у подключенных через include_router роутеров в новых версиях FastAPI нет path - их маршруты не под /links/)
+_route_paths = [getattr(route, "path", "") for route in app.routes]
+reserved = frozenset(
+    path[len(FastRedirectMiddleware.prefix):] for path in _route_paths
+    if path.startswith(FastRedirectMiddleware.prefix) and path.count("/") == 2 and "{" not in path
+)
+if FAST_REDIRECT_ENABLED:
+    app.add_middleware(FastRedirectMiddleware, reserved=reserved)
+# лимит проверяется до быстрого редиректа и до открытия сессии БД
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, rules=default_rules(reserved))
+app.add_middleware(MetricsMiddleware)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", log_level="info")
\ No newline at end of file
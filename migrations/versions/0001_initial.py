@@ -0,0 +1,60 @@
+"""Исходная схема: users, links, link_stats
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Для БД, которые уже были созданы через Base.metadata.create_all, достаточно
+выполнить `alembic stamp 0001`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(100), nullable=False, unique=True),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "links",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("original_url", sa.Text(), nullable=False),
+        sa.Column("short_code", sa.String(50), nullable=False, unique=True),
+        sa.Column("custom_alias", sa.String(50), nullable=True, unique=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_accessed_at", sa.DateTime(), nullable=True),
+        sa.Column("access_count", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+    op.create_index("ix_links_id", "links", ["id"])
+
+    op.create_table(
+        "link_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("link_id", sa.Integer(), sa.ForeignKey("links.id"), nullable=False),
+        sa.Column("accessed_at", sa.DateTime(), nullable=True),
+        sa.Column("ip_address", sa.String(50), nullable=True),
+        sa.Column("user_agent", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_link_stats_id", "link_stats", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("link_stats")
+    op.drop_table("links")
+    op.drop_table("users")
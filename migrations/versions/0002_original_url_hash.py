@@ -0,0 +1,32 @@
+"""Индексируемый хэш оригинального URL для поиска по /links/search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("links", sa.Column("original_url_hash", sa.String(64), nullable=True))
+    # заполняем хэш для уже существующих ссылок тем же способом, что и get_url_hash
+    op.execute(
+        "UPDATE links SET original_url_hash = encode(sha256(convert_to(original_url, 'UTF8')), 'hex') "
+        "WHERE original_url_hash IS NULL"
+    )
+    op.alter_column("links", "original_url_hash", nullable=False)
+    # индекс строится без блокировки записи в таблицу
+    with op.get_context().autocommit_block():
+        op.create_index("ix_links_original_url_hash", "links", ["original_url_hash"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_original_url_hash", table_name="links")
+    op.drop_column("links", "original_url_hash")
@@ -0,0 +1,27 @@
+"""Счетчик для генерации коротких кодов блоками
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "code_counters",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+    )
+    op.execute("INSERT INTO code_counters (name, value) VALUES ('links', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("code_counters")
@@ -0,0 +1,22 @@
+"""Индекс по expires_at для пакетной очистки протухших ссылок
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_links_expires_at", "links", ["expires_at"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_expires_at", table_name="links")
@@ -0,0 +1,25 @@
+"""link_stats: каскадное удаление вместе со ссылкой и индекс по link_id
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint("link_stats_link_id_fkey", "link_stats", type_="foreignkey")
+    op.create_foreign_key("link_stats_link_id_fkey", "link_stats", "links", ["link_id"], ["id"], ondelete="CASCADE")
+    op.create_index("ix_link_stats_link_id", "link_stats", ["link_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_link_stats_link_id", table_name="link_stats")
+    op.drop_constraint("link_stats_link_id_fkey", "link_stats", type_="foreignkey")
+    op.create_foreign_key("link_stats_link_id_fkey", "link_stats", "links", ["link_id"], ["id"])
@@ -0,0 +1,39 @@
+"""Referrer в link_stats и предагрегированные таблицы переходов
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("link_stats", sa.Column("referrer", sa.Text(), nullable=True))
+    op.create_table(
+        "link_click_rollups",
+        sa.Column("link_id", sa.Integer(), sa.ForeignKey("links.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("granularity", sa.String(10), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("clicks", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "link_dimension_rollups",
+        sa.Column("link_id", sa.Integer(), sa.ForeignKey("links.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("day", sa.DateTime(), primary_key=True),
+        sa.Column("dimension", sa.String(20), primary_key=True),
+        sa.Column("value", sa.String(255), primary_key=True),
+        sa.Column("clicks", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("link_dimension_rollups")
+    op.drop_table("link_click_rollups")
+    op.drop_column("link_stats", "referrer")
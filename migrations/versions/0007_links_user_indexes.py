@@ -0,0 +1,31 @@
+"""Составные индексы для списка ссылок пользователя и флаги пользователя, которые использует FastAPI-Users
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("is_superuser", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column("users", sa.Column("is_verified", sa.Boolean(), nullable=False, server_default=sa.false()))
+    with op.get_context().autocommit_block():
+        op.create_index("ix_links_user_id_created_at", "links", ["user_id", "created_at", "id"],
+                        postgresql_concurrently=True)
+        op.create_index("ix_links_user_id_access_count", "links", ["user_id", "access_count", "id"],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_links_user_id_access_count", table_name="links")
+    op.drop_index("ix_links_user_id_created_at", table_name="links")
+    op.drop_column("users", "is_verified")
+    op.drop_column("users", "is_superuser")
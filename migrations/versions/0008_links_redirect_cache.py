@@ -0,0 +1,24 @@
+"""Постоянные редиректы и дата изменения ссылки
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("links", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.add_column("links", sa.Column("is_permanent", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column("links", "is_permanent")
+    op.drop_column("links", "updated_at")
@@ -0,0 +1,101 @@
+"""Секционирование link_stats по месяцам и индекс по access_count
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+link_stats пересоздается как секционированная по accessed_at таблица (только Postgres), существующие
+строки копируются в секции. Первичный ключ секционированной таблицы обязан содержать ключ
+секционирования, поэтому он становится (id, accessed_at); id по-прежнему выдается последовательностью.
+Копирование идет одной транзакцией: на большой таблице миграцию лучше выполнять в окно обслуживания.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from auth.partitions import DEFAULT_PARTITION, add_months, create_partition_sql, month_start
+from config import LINK_STATS_PARTITIONS_AHEAD
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # индекс для выборки самых посещаемых ссылок (ORDER BY access_count DESC LIMIT n)
+    with op.get_context().autocommit_block():
+        op.create_index("ix_links_access_count", "links", ["access_count"], postgresql_concurrently=True)
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE link_stats RENAME TO link_stats_old")
+    op.execute("ALTER TABLE link_stats_old RENAME CONSTRAINT link_stats_pkey TO link_stats_old_pkey")
+    op.execute("ALTER TABLE link_stats_old RENAME CONSTRAINT link_stats_link_id_fkey TO link_stats_old_link_id_fkey")
+    op.execute("ALTER INDEX ix_link_stats_link_id RENAME TO ix_link_stats_old_link_id")
+    op.execute("ALTER INDEX IF EXISTS ix_link_stats_id RENAME TO ix_link_stats_old_id")
+    op.execute("""
+        CREATE TABLE link_stats (
+            id INTEGER NOT NULL DEFAULT nextval('link_stats_id_seq'),
+            link_id INTEGER NOT NULL,
+            accessed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            ip_address VARCHAR(50),
+            user_agent TEXT,
+            referrer TEXT,
+            CONSTRAINT link_stats_pkey PRIMARY KEY (id, accessed_at),
+            CONSTRAINT link_stats_link_id_fkey FOREIGN KEY (link_id) REFERENCES links (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (accessed_at)
+    """)
+    op.execute("CREATE INDEX ix_link_stats_link_id ON link_stats (link_id)")
+    # последовательность принадлежит старой таблице и удалилась бы вместе с ней
+    op.execute("ALTER SEQUENCE link_stats_id_seq OWNED BY link_stats.id")
+
+    now = datetime.utcnow()
+    oldest = bind.scalar(sa.text("SELECT min(accessed_at) FROM link_stats_old"))
+    month = month_start(min(oldest or now, now))
+    last = add_months(month_start(now), LINK_STATS_PARTITIONS_AHEAD)
+    while month <= last:
+        op.execute(create_partition_sql(month))
+        month = add_months(month, 1)
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF link_stats DEFAULT")
+
+    op.execute("""
+        INSERT INTO link_stats (id, link_id, accessed_at, ip_address, user_agent, referrer)
+        SELECT id, link_id, COALESCE(accessed_at, now() AT TIME ZONE 'utc'), ip_address, user_agent, referrer
+        FROM link_stats_old
+    """)
+    op.execute("DROP TABLE link_stats_old")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE link_stats RENAME TO link_stats_partitioned")
+        op.execute("ALTER TABLE link_stats_partitioned RENAME CONSTRAINT link_stats_pkey TO link_stats_partitioned_pkey")
+        op.execute("ALTER TABLE link_stats_partitioned "
+                   "RENAME CONSTRAINT link_stats_link_id_fkey TO link_stats_partitioned_link_id_fkey")
+        op.execute("ALTER INDEX ix_link_stats_link_id RENAME TO ix_link_stats_partitioned_link_id")
+        op.execute("""
+            CREATE TABLE link_stats (
+                id INTEGER NOT NULL DEFAULT nextval('link_stats_id_seq'),
+                link_id INTEGER NOT NULL,
+                accessed_at TIMESTAMP WITHOUT TIME ZONE,
+                ip_address VARCHAR(50),
+                user_agent TEXT,
+                referrer TEXT,
+                CONSTRAINT link_stats_pkey PRIMARY KEY (id),
+                CONSTRAINT link_stats_link_id_fkey FOREIGN KEY (link_id) REFERENCES links (id) ON DELETE CASCADE
+            )
+        """)
+        op.execute("CREATE INDEX ix_link_stats_link_id ON link_stats (link_id)")
+        op.execute("CREATE INDEX ix_link_stats_id ON link_stats (id)")
+        op.execute("ALTER SEQUENCE link_stats_id_seq OWNED BY link_stats.id")
+        op.execute("""
+            INSERT INTO link_stats (id, link_id, accessed_at, ip_address, user_agent, referrer)
+            SELECT id, link_id, accessed_at, ip_address, user_agent, referrer FROM link_stats_partitioned
+        """)
+        op.execute("DROP TABLE link_stats_partitioned")
+    op.drop_index("ix_links_access_count", table_name="links")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Boolean, Text, Index, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -21,6 +21,8 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)        # Хэшированный пароль
     created_at = Column(DateTime, default=datetime.utcnow)       # Дата создания пользователя
     is_active = Column(Boolean, default=True)                    # Флаг активности пользователя
+    is_superuser = Column(Boolean, nullable=False, default=False, server_default=false())  # Флаг суперпользователя
+    is_verified = Column(Boolean, nullable=False, default=False, server_default=false())   # Флаг верификации
     links = relationship('Link', back_populates='user')
 
     # id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -41,16 +43,28 @@ class Link(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     original_url = Column(Text, nullable=False)
+    original_url_hash = Column(String(64), nullable=False, index=True)   # SHA-256 от original_url для поиска по индексу
     short_code = Column(String(50), unique=True, nullable=False)
     custom_alias = Column(String(50), unique=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)       # Дата создания ссылки
-    expires_at = Column(DateTime, nullable=True)                 # Дата окончания действия ссылки
+    expires_at = Column(DateTime, nullable=True, index=True)     # Дата окончания действия ссылки
     last_accessed_at = Column(DateTime, nullable=True)           # Дата последнего использования
     access_count = Column(Integer, default=0)                    # Количество переходов по ссылке
+    updated_at = Column(DateTime, nullable=True)                 # Дата последнего изменения URL
+    is_permanent = Column(Boolean, nullable=False, default=False, server_default=false())  # 301 вместо 302
 
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     user = relationship('User', back_populates='links')
 
+    # индексы для постраничного списка ссылок пользователя (GET /users/me/links); id в конце индекса
+    # задает однозначный порядок при равных значениях и позволяет продолжать выборку с курсора
+    __table_args__ = (
+        Index('ix_links_user_id_created_at', 'user_id', 'created_at', 'id'),
+        Index('ix_links_user_id_access_count', 'user_id', 'access_count', 'id'),
+        # самые посещаемые ссылки для закрепленного набора и прогрева кэша
+        Index('ix_links_access_count', 'access_count'),
+    )
+
     def increment_access_count(self):
         """
         Увеличивает счетчик переходов и обновляет дату последнего доступа.
@@ -62,14 +76,57 @@ class Link(Base):
 class LinkStats(Base):
     """
     Модель статистики ссылок, которая хранит историю доступа к ссылкам.
-    Эта модель позволяет отслеживать детальную статистику по каждому переходу
+    Эта модель позволяет отслеживать детальную статистику по каждому переходу.
+    В Postgres таблица секционирована по месяцам accessed_at (миграция 0009), первичный ключ
+    там (id, accessed_at); старые секции удаляет очистка протухших ссылок. В модели ключ - только id,
+    чтобы create_all (SQLite в бенчмарках) выдавал id автоинкрементом.
     """
     __tablename__ = 'link_stats'
 
-    id = Column(Integer, primary_key=True, index=True)
-    link_id = Column(Integer, ForeignKey('links.id'), nullable=False)
-    accessed_at = Column(DateTime, default=datetime.utcnow)            # Дата и время доступа
+    id = Column(Integer, primary_key=True)
+    link_id = Column(Integer, ForeignKey('links.id', ondelete='CASCADE'), nullable=False, index=True)
+    accessed_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Дата и время доступа (ключ секций)
     ip_address = Column(String(50), nullable=True)                     # IP-адрес пользователя
     user_agent = Column(Text, nullable=True)                           # User-Agent браузера
+    referrer = Column(Text, nullable=True)                             # Заголовок Referer
 
     link = relationship('Link', backref='stats')
+
+
+class CodeCounter(Base):
+    """
+    Модель счетчика, из которого воркеры блоками резервируют номера для коротких кодов
+    (стратегия генерации кодов counter).
+    """
+    __tablename__ = 'code_counters'
+
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)             # верхняя граница последнего выданного блока
+
+
+class LinkClickRollup(Base):
+    """
+    Модель предагрегированной статистики: количество переходов по ссылке за минуту, час или день.
+    Обновляется пачками из потока событий переходов, так что запросы временных рядов
+    не читают сырые строки link_stats.
+    """
+    __tablename__ = 'link_click_rollups'
+
+    link_id = Column(Integer, ForeignKey('links.id', ondelete='CASCADE'), primary_key=True)
+    granularity = Column(String(10), primary_key=True)                 # minute, hour или day
+    bucket_start = Column(DateTime, primary_key=True)                  # Начало интервала
+    clicks = Column(BigInteger, nullable=False, default=0)             # Количество переходов за интервал
+
+
+class LinkDimensionRollup(Base):
+    """
+    Модель предагрегированной статистики: количество переходов по ссылке за день
+    в разрезе User-Agent или referrer.
+    """
+    __tablename__ = 'link_dimension_rollups'
+
+    link_id = Column(Integer, ForeignKey('links.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(DateTime, primary_key=True)                           # Начало дня
+    dimension = Column(String(20), primary_key=True)                   # user_agent или referrer
+    value = Column(String(255), primary_key=True)                      # Значение (обрезается до 255 символов)
+    clicks = Column(BigInteger, nullable=False, default=0)             # Количество переходов за день
@@ -0,0 +1,44 @@
+"""
+Тесты запускают приложение в процессе через httpx.ASGITransport поверх SQLite (aiosqlite),
+так что Postgres не нужен. Зависимости - tests/requirements.txt.
+
+Запуск из корня репозитория:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# настройки читаются при импорте config.py, поэтому задаются до импорта приложения
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_tmp.name, 'test.db')}")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def run_app():
+    """
+    Выполняет async-функцию test(client) внутри lifespan приложения; схема создается через create_all,
+    потому что миграции рассчитаны на Postgres.
+    """
+    import httpx
+
+    from auth.database import create_db_and_tables, engine
+    from main import app
+
+    async def run(test):
+        await create_db_and_tables()
+        try:
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://test") as client:
+                    return await test(client)
+        finally:
+            await engine.dispose()
+
+    return lambda test: asyncio.run(run(test))
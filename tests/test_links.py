@@ -0,0 +1,74 @@
+from uuid import uuid4
+
+from sqlalchemy import select
+
+
+async def _stored_codes(aliases: list[str]) -> dict:
+    # short_code ссылок с заданными alias так, как они записаны в БД
+    from auth.database import async_session
+    from models.models import Link
+
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(Link.custom_alias, Link.short_code).where(Link.custom_alias.in_(aliases)))).all()
+    return dict(rows)
+
+
+def test_batch_reports_only_stored_links(run_app):
+    # ссылки на один URL с разными alias получают одинаковый хэш-код; "created" должно
+    # возвращаться только для строк, которые действительно вставлены
+    run = uuid4().hex[:8]
+    aliases = [f"batch{i}-{run}" for i in range(7)]
+
+    async def test(client):
+        resp = await client.post("/links/shorten/batch", json=[
+            {"original_url": f"https://example.com/batch/{run}", "custom_alias": alias} for alias in aliases])
+        assert resp.status_code == 200
+        return resp.json(), await _stored_codes(aliases)
+
+    results, stored = run_app(test)
+    created = {item["custom_alias"]: item["short_code"] for item in results if item["status"] == "created"}
+    assert created
+    assert created == stored
+    assert len(set(created.values())) == len(created)
+    assert all(item["status"] in ("created", "code_conflict") for item in results)
+
+
+def test_url_variants_get_own_codes(run_app):
+    # каждый вариант ссылки на один URL получает свой код, а не следующий по длине префикс того же хэша
+    run = uuid4().hex[:8]
+    url = f"https://example.com/campaign/{run}"
+    aliases = [f"camp{i}-{run}" for i in range(7)]
+
+    async def test(client):
+        single = [await client.post("/links/shorten", json={"original_url": url, "custom_alias": alias})
+                  for alias in aliases]
+        batch = await client.post("/links/shorten/batch", json=[
+            {"original_url": url, "custom_alias": f"b{alias}"} for alias in aliases])
+        plain = [await client.post("/links/shorten", json={"original_url": url}) for _ in range(2)]
+        return single, batch.json(), plain
+
+    single, batch, plain = run_app(test)
+    assert [resp.status_code for resp in single] == [200] * len(aliases)
+    assert [item["status"] for item in batch] == ["created"] * len(aliases)
+    codes = {resp.json()["short_code"] for resp in single} | {item["short_code"] for item in batch}
+    assert len(codes) == 2 * len(aliases)
+    # ссылка без параметров по-прежнему дедуплицируется по URL
+    assert plain[0].json()["short_code"] == plain[1].json()["short_code"]
+    assert plain[0].json()["short_code"] not in codes
+
+
+def test_search_returns_earliest_link_for_url(run_app):
+    run = uuid4().hex[:8]
+    url = f"https://example.com/search/{run}"
+
+    async def test(client):
+        first = await client.post("/links/shorten", json={"original_url": url, "custom_alias": f"first-{run}"})
+        for i in range(3):
+            await client.post("/links/shorten", json={"original_url": url, "custom_alias": f"later{i}-{run}"})
+        found = await client.get("/links/search", params={"original_url": url})
+        return first.json(), found
+
+    first, found = run_app(test)
+    assert found.status_code == 200
+    assert found.json()["short_code"] == first["short_code"]